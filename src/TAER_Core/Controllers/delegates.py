@@ -8,6 +8,7 @@ class DelegatesMain:
         self.presenter = presenter
         self.view = view
         self.model = model
+        self.resume_capture = False
 
     #
     # Main view
@@ -21,9 +22,7 @@ class DelegatesMain:
         self.presenter.logger.info("Start capture.")
 
     def on_reset(self):
-        self.model.device.actions.reset_device()
-        self.model.device.actions.reset_fifo()
-        self.model.device.actions.reset_ram()
+        self.model.reset_device()
         self.presenter.logger.debug("Reset device.")
 
     def on_reset_periphery(self):
@@ -32,7 +31,7 @@ class DelegatesMain:
 
     def on_reset_chip(self):
         self.presenter.logger.info("Reset chip.")
-        self.model.device.actions.reset_chip()
+        self.model.reset_chip()
 
     def on_mode_change(self, mode):
         self.presenter.set_mode(mode)
@@ -44,11 +43,17 @@ class DelegatesMain:
         if not self.model.device.is_connected:
             self.presenter.logger.info("Device disconnected")
             self.model.binary_file = ""
+            self.resume_capture = not self.presenter.stop_cature_flag
             self.presenter.stop_main_img_thread()
             self.model.reset_image()
             self.presenter.update_image()
         else:
             self.presenter.logger.info("On connection")
+            if self.model.restore_state():
+                self.presenter.logger.info("Device state restored.")
+                if self.resume_capture and self.model.reconnect_resume_capture:
+                    wx.CallAfter(self.presenter.start_main_img_thread)
+            self.resume_capture = False
         self.presenter.update_view()
 
     def on_program(self):
@@ -59,8 +64,7 @@ class DelegatesMain:
             style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST | wx.FD_CHANGE_DIR,
         ) as fileDialog:
             if fileDialog.ShowModal() != wx.ID_CANCEL:
-                self.model.binary_file = fileDialog.GetPath()
-                self.model.device.program(self.model.binary_file)
+                self.model.program(fileDialog.GetPath())
                 # Just read the FPGA registers because the chip register maybe need
                 # clock activation
                 self.model.read_dev_registers()
@@ -75,8 +79,7 @@ class DelegatesMain:
 
         if path.exists(bin_path):
             file_history.AddFileToHistory(bin_path)
-            self.model.binary_file = bin_path
-            self.model.device.program(bin_path)
+            self.model.program(bin_path)
             # Just read the FPGA registers because the chip register maybe need
             # clock activation
             self.model.read_dev_registers()
@@ -125,11 +128,14 @@ class DelegatesMain:
 
     def on_scale_histogram(self):
         view = self.view.image_histogram_frame
-        max, min, bins = view.get_bin_settings()
-        self.model.img_histogram.set_settings(max, min, bins)
+        max, min, bins, frames = view.get_bin_settings()
+        try:
+            self.model.img_histogram.set_settings(max, min, bins, frames)
+        except ValueError as e:
+            self.presenter.logger.error(e)
+            return
         view.scale()
-        self.presenter.process_img()
-        self.presenter.update_image()
+        self.presenter.update_histogram()
 
     #
     # Tools menu views
@@ -1,2 +1,10 @@
 from .config import Config, Dict2Class, ModelConfig, ViewConfig
-from .dev_opal_kelly import Device, LINK_VALUE_DEF, TRIGGER_DEF
+from .dev_opal_kelly import (
+    CompletionWaiter,
+    Device,
+    DeviceLockTimeout,
+    DevicePool,
+    IoTrace,
+    LINK_VALUE_DEF,
+    TRIGGER_DEF,
+)
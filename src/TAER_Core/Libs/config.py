@@ -1,6 +1,15 @@
+import copy
+import hashlib
+import logging
+import marshal
+import os
+import sys
 import yaml
 from os import path
 
+# C implementation of the YAML parser when libyaml is available
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 class Dict2Class:
     def __init__(self, my_dict: "dict[str, object]"):
@@ -12,7 +21,16 @@ class Dict2Class:
 
 
 class Config:
+    """Configuration file. The YAML file is parsed once per session: the parsed content is kept in memory while
+    the file modification time and size don't change, and it is also stored in a cache file in the user cache
+    folder (see get_cache_folder) which is reused in the next sessions while the SHA-256 of the YAML file, the
+    Python version and the marshal format version match."""
+
     CONFIG_PATH = ""
+    CACHE_VERSION = 2
+    # The marshal format depends on the interpreter
+    CACHE_KEY = (CACHE_VERSION, tuple(sys.version_info[:2]), marshal.version)
+    __session_cache = {}
 
     def __init__(self, config_path=None):
         if config_path is None:
@@ -22,9 +40,65 @@ class Config:
             if path.exists(config_path):
                 self.value = self.__load_config(config_path)
 
+    @staticmethod
+    def get_cache_folder() -> str:
+        if sys.platform == "win32":
+            folder = os.environ.get("LOCALAPPDATA") or path.join(path.expanduser("~"), "AppData", "Local")
+        else:
+            folder = os.environ.get("XDG_CACHE_HOME") or path.join(path.expanduser("~"), ".cache")
+        return path.join(folder, "TAER_Core")
+
+    @classmethod
+    def get_cache_path(cls, file_path: str) -> str:
+        file_path = path.abspath(file_path)
+        path_digest = hashlib.sha256(file_path.encode()).hexdigest()[:16]
+        version = "".join(str(v) for v in sys.version_info[:2])
+        return path.join(cls.get_cache_folder(), f"{path.basename(file_path)}.{path_digest}.py{version}.cache")
+
+    @classmethod
+    def clear_session_cache(cls):
+        cls.__session_cache.clear()
+
     def __load_config(self, file_path: str):
-        with open(file_path, "r") as f:
-            return yaml.safe_load(f)
+        file_path = path.abspath(file_path)
+        stat = os.stat(file_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.__session_cache.get(file_path)
+        if cached is None or cached[0] != key:
+            cached = (key, self.__parse_config(file_path))
+            self.__session_cache[file_path] = cached
+        # Every caller gets its own copy of the content
+        return marshal.loads(cached[1]) if isinstance(cached[1], bytes) else copy.deepcopy(cached[1])
+
+    def __parse_config(self, file_path: str):
+        logger = logging.getLogger(__name__)
+        with open(file_path, "rb") as f:
+            source = f.read()
+        digest = hashlib.sha256(source).digest()
+        cache_path = self.get_cache_path(file_path)
+        try:
+            with open(cache_path, "rb") as f:
+                cache_key, cache_digest, content = marshal.load(f)
+            if cache_key == self.CACHE_KEY and cache_digest == digest:
+                return content
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        value = yaml.load(source, Loader=YamlLoader)
+        try:
+            content = marshal.dumps(value)
+        except ValueError:
+            # Types which marshal doesn't support (e.g. dates), the content isn't cached
+            logger.debug("The configuration of %s can't be cached.", file_path)
+            return value
+        try:
+            os.makedirs(path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                marshal.dump((self.CACHE_KEY, digest, content), f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.debug("The configuration cache %s can't be written: %s", cache_path, e)
+        return content
 
 
 class ViewConfig:
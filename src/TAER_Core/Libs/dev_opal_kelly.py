@@ -1,26 +1,92 @@
 """ Opal Kelly device class """
 
+import hashlib
+import json
 import logging
+import os
 import time
-import ok
-from threading import Lock
+from contextlib import contextmanager
+from functools import wraps
+from threading import RLock, local
+import numpy as np
+from TAER_Core.Libs.config import Config
+
+try:
+    import ok
+
+    SDK_AVAILABLE = True
+except ImportError:
+    # FrontPanel SDK not installed (e.g. CI machines). The simulated names only let the module be imported, a
+    # simulated board still has to be selected explicitly (see Device.use_simulator)
+    from TAER_Core.Libs import dev_simulated as ok
+
+    SDK_AVAILABLE = False
+
+
+class DeviceLockTimeout(TimeoutError):
+    """The device lock couldn't be acquired in time"""
+
+
+class LockStats:
+    """Statistics of the device lock usage. Times are in seconds and only the outermost acquisitions count."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self):
+        self.acquisitions = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.held_time = 0.0
+        self.max_held_time = 0.0
+
+    def add(self, wait_time: float, held_time: float):
+        self.acquisitions = self.acquisitions + 1
+        self.wait_time = self.wait_time + wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.held_time = self.held_time + held_time
+        self.max_held_time = max(self.max_held_time, held_time)
 
 
 class Device(ok.FrontPanelManager):
-    """Class to interface with AER readers."""
+    """Class to interface with AER readers.
 
-    def __init__(self):
+    The content hash of the last bitstream loaded in every board is kept by serial number, so programming the
+    same bitstream again only resets the device.
+
+    Args:
+        serial (str, optional): Serial number of the board driven by this device. Defaults to None (the first
+            board connected).
+        manager (ok.FrontPanelManager, optional): Manager which monitors the boards and opens them, e.g. a
+            DevicePool. Defaults to None (the device monitors the boards itself).
+    """
+
+    # Serial number -> content hash of the bitstream loaded in the board, kept between sessions in a file of the
+    # user cache folder (see get_bitstreams_path) and loaded on first use
+    loaded_bitstreams = None
+    bitstreams_lock = RLock()
+
+    def __init__(self, serial: str = None, manager=None):
         # Monitor connection and disconnections
         ok.FrontPanelManager.__init__(self)
+        self.serial = serial
+        self.manager = manager
         # Handler to open the device
         self.__handler = ok.okCFrontPanel()
         # Device info
         self.vendor_info = ok.okTDeviceInfo()
         self.info = DeviceInfo()
         # Logic
-        self.lock = Lock()
+        self.lock = RLock()
+        self.lock_timeout = 5
+        self.calibration_timeout = 3
+        self.lock_stats = LockStats()
+        self.__lock_depth = 0
+        self.__lock_wait_time = 0.0
+        self.__lock_t0 = 0.0
         self.is_connected = False
         self.on_connection_change_callback = None
+        self.simulator = None
         # Logging
         self.logger = logging.getLogger(__name__)
         # Actions
@@ -50,41 +116,121 @@ class Device(ok.FrontPanelManager):
 
         return True
 
+    def use_simulator(self, front_panel):
+        """Replace the USB front panel with a simulated one (see dev_simulated.SimFrontPanel).
+
+        Args:
+            front_panel (SimFrontPanel): The simulated front panel to use
+        """
+        self.simulator = front_panel
+
     def start(self):
         """Start the device operation."""
-        self.StartMonitoring()
+        if self.simulator is not None:
+            self.OnDeviceAdded(self.simulator.serial)
+        elif not SDK_AVAILABLE:
+            self.logger.error("The Opal Kelly FrontPanel SDK (ok) is not installed, the board can't be connected.")
+        elif self.manager is None:
+            self.StartMonitoring()
 
     def stop(self):
         """Stop the device operation."""
-        self.StopMonitoring()
+        if self.simulator is None and self.manager is None and SDK_AVAILABLE:
+            self.StopMonitoring()
 
-    def program(self, bitstream: str):
+    def program(self, bitstream: str) -> bool:
         """Configure the Opal Kelly FPGA as well as load the bitstream
 
         Args:
             bitstream (str): The path where it is the bitstream
+
+        Returns:
+            bool: True if the device is configured successfully, False otherwise
         """
-        self.config(bitstream)
+        is_configured = self.config(bitstream)
 
         self.initialize()
 
+        return is_configured
+
     def initialize(self):
         """A method to initialize the FPGA, not used at the moment"""
         pass
 
+    def is_configured(self) -> bool:
+        """Check if the FPGA keeps a configuration with the FrontPanel endpoints enabled (e.g. after a reconnection)
+
+        Returns:
+            bool: True if the FPGA is configured, False otherwise
+        """
+        if self.__handler is None:
+            return False
+        self.__get_lock__()
+        is_enable = self.__handler.IsFrontPanelEnabled()
+        self.__release_lock__()
+        return is_enable
+
     def __get_lock__(self):
-        """Get the mutex to implement thread-safe operation"""
-        self.lock.acquire(timeout=5)
+        """Get the mutex to implement thread-safe operation
+
+        Raises:
+            DeviceLockTimeout: If the mutex isn't released by other thread before "lock_timeout" seconds
+        """
+        t0 = time.perf_counter()
+        if not self.lock.acquire(timeout=self.lock_timeout):
+            raise DeviceLockTimeout(f"Device lock not acquired after {self.lock_timeout} s.")
+        self.__lock_depth = self.__lock_depth + 1
+        if self.__lock_depth == 1:
+            self.__lock_t0 = time.perf_counter()
+            self.__lock_wait_time = self.__lock_t0 - t0
 
     def __release_lock__(self):
         """Release the mutex to implement thread-safe operation"""
+        self.__lock_depth = self.__lock_depth - 1
+        if self.__lock_depth == 0:
+            self.lock_stats.add(self.__lock_wait_time, time.perf_counter() - self.__lock_t0)
         self.lock.release()
 
+    @contextmanager
+    def session(self):
+        """Hold the device for a whole multi-step operation so other threads can't interleave with it. Sessions
+        can be nested and every primitive inside them reuses the same lock.
+
+            with device.session() as actions:
+                actions.write_serial(data)
+                data = actions.read_serial()
+
+        Raises:
+            DeviceLockTimeout: If the device isn't released by other thread before "lock_timeout" seconds
+        """
+        self.__get_lock__()
+        try:
+            yield self.actions
+        finally:
+            self.__release_lock__()
+
     #
     # Device configuration
     #
-    def config(self, bit_stream_path: str = "") -> bool:
-        """Configure the device"""
+    def config(self, bit_stream_path: str = "", force: bool = False) -> bool:
+        """Configure the device. If the board already runs the same bitstream (same content hash) it is only
+        reset.
+
+        Args:
+            bit_stream_path (str, optional): The path where it is the bitstream. Defaults to "".
+            force (bool, optional): Configure the FPGA even if the bitstream is already loaded. Defaults to False.
+
+        Returns:
+            bool: True if the device is configured successfully, False otherwise
+        """
+        serial = self.info.serial_number
+        bitstream_hash = self.__hash_bitstream(bit_stream_path)
+        is_loaded = bitstream_hash is not None and self.__get_loaded_bitstream(serial) == bitstream_hash
+        if is_loaded and not force and self.is_configured() and self.actions.check_calibration():
+            self.logger.info("Bitstream already loaded in device %s, resetting it.", self.vendor_info.productName)
+            self.actions.reset_device()
+            return True
+        self.__set_loaded_bitstream(serial, None)
         self.__get_lock__()
         self.__handler.LoadDefaultPLLConfiguration()
         err_code = self.__handler.ConfigureFPGA(bit_stream_path)
@@ -99,13 +245,63 @@ class Device(ok.FrontPanelManager):
         if not is_enable:
             self.logger.error("Front Panel isn't enabled.")
             return False
-        time.sleep(1.5)
-        if not self.actions.check_calibration():
+        if not self.actions.waiters["calibration"].wait(
+            self.actions.check_calibration, self.calibration_timeout, period_max=0.01
+        ):
             self.logger.error("Device RAM isn't calibrated.")
             return False
         self.actions.reset_device()
+        if bitstream_hash is not None:
+            self.__set_loaded_bitstream(serial, bitstream_hash)
         return True
 
+    @staticmethod
+    def get_bitstreams_path() -> str:
+        """Path of the file which keeps the bitstream loaded in every board between sessions"""
+        return os.path.join(Config.get_cache_folder(), "loaded_bitstreams.json")
+
+    @classmethod
+    def __get_loaded_bitstream(cls, serial: str):
+        with cls.bitstreams_lock:
+            if cls.loaded_bitstreams is None:
+                try:
+                    with open(cls.get_bitstreams_path(), "r") as f:
+                        cls.loaded_bitstreams = dict(json.load(f))
+                except (OSError, ValueError, TypeError):
+                    cls.loaded_bitstreams = {}
+            return cls.loaded_bitstreams.get(serial)
+
+    @classmethod
+    def __set_loaded_bitstream(cls, serial: str, bitstream_hash: str):
+        with cls.bitstreams_lock:
+            if cls.__get_loaded_bitstream(serial) == bitstream_hash:
+                return
+            if bitstream_hash is None:
+                cls.loaded_bitstreams.pop(serial, None)
+            else:
+                cls.loaded_bitstreams[serial] = bitstream_hash
+            file_path = cls.get_bitstreams_path()
+            try:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                tmp_path = f"{file_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(cls.loaded_bitstreams, f)
+                os.replace(tmp_path, file_path)
+            except OSError as e:
+                logging.getLogger(__name__).debug("The loaded bitstreams can't be saved in %s: %s", file_path, e)
+
+    @staticmethod
+    def __hash_bitstream(bit_stream_path: str):
+        """Get the SHA-256 of the bitstream content, None if it can't be read"""
+        digest = hashlib.sha256()
+        try:
+            with open(bit_stream_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
     def register_on_connection_change_callback(self, callback):
         self.on_connection_change_callback = callback
 
@@ -119,9 +315,11 @@ class Device(ok.FrontPanelManager):
 
         if self.is_connected:
             return
+        if self.serial is not None and serial != self.serial:
+            return
 
         self.__get_lock__()
-        self.__handler = self.Open(serial)
+        self.__handler = self.__open(serial)
         self.__release_lock__()
         if not self.__handler:
             self.logger.error("A device could not be opened.")
@@ -132,6 +330,14 @@ class Device(ok.FrontPanelManager):
                 self.is_connected = True
                 self.launch_on_connection_change_callback()
 
+    def __open(self, serial: str):
+        if self.simulator is not None:
+            self.simulator.open()
+            return self.simulator
+        if self.manager is not None:
+            return self.manager.Open(serial)
+        return self.Open(serial)
+
     def OnDeviceRemoved(self, serial: str) -> None:
         """Callback called when the device is disconnected"""
         self.__get_lock__()
@@ -148,6 +354,85 @@ class Device(ok.FrontPanelManager):
             self.logger.debug("On device %s disconnected.", serial)
 
 
+class DevicePool(ok.FrontPanelManager):
+    """Several boards driven concurrently from one process. The pool monitors the USB connections and keeps a
+    Device (with its own lock and DeviceActions) per serial number. A board which is connected again is
+    attached to the same Device.
+    """
+
+    def __init__(self):
+        ok.FrontPanelManager.__init__(self)
+        self.devices = {}
+        self.lock = RLock()
+        self.on_device_added_callback = None
+        self.logger = logging.getLogger(__name__)
+
+    def register_on_device_added_callback(self, callback):
+        """Register a callback called with the new Device the first time a board is connected"""
+        self.on_device_added_callback = callback
+
+    def get_device(self, serial: str) -> Device:
+        """Get the device of a board, creating it if it doesn't exist
+
+        Args:
+            serial (str): The serial number of the board
+
+        Returns:
+            Device: The device bound to the board
+        """
+        with self.lock:
+            device = self.devices.get(serial)
+            is_new = device is None
+            if is_new:
+                device = Device(serial, self)
+                self.devices[serial] = device
+        if is_new and self.on_device_added_callback is not None:
+            self.on_device_added_callback(device)
+        return device
+
+    def add_simulator(self, front_panel) -> Device:
+        """Add a simulated board to the pool (see dev_simulated.SimFrontPanel)
+
+        Args:
+            front_panel (SimFrontPanel): The simulated front panel. Its serial number must be unique in the pool.
+
+        Returns:
+            Device: The device bound to the simulated board
+        """
+        with self.lock:
+            device = Device(front_panel.serial, self)
+            device.use_simulator(front_panel)
+            self.devices[front_panel.serial] = device
+        if self.on_device_added_callback is not None:
+            self.on_device_added_callback(device)
+        return device
+
+    def start(self):
+        """Start monitoring the boards and connect the simulated ones"""
+        for device in list(self.devices.values()):
+            if device.simulator is not None:
+                device.start()
+        if SDK_AVAILABLE:
+            self.StartMonitoring()
+        elif not self.devices:
+            self.logger.error("The Opal Kelly FrontPanel SDK (ok) is not installed, no board can be connected.")
+
+    def stop(self):
+        """Stop monitoring the boards"""
+        if SDK_AVAILABLE:
+            self.StopMonitoring()
+
+    def OnDeviceAdded(self, serial: str) -> None:
+        """Callback called when a board is connected"""
+        self.get_device(serial).OnDeviceAdded(serial)
+
+    def OnDeviceRemoved(self, serial: str) -> None:
+        """Callback called when a board is disconnected"""
+        device = self.devices.get(serial)
+        if device is not None and device.is_connected:
+            device.OnDeviceRemoved(serial)
+
+
 class DeviceInfo:
     def __init__(self) -> None:
         self.vendor = str()
@@ -162,6 +447,150 @@ class DeviceInfo:
         self.dev_version = ".".join([str(values.deviceMajorVersion), str(values.deviceMinorVersion)])
 
 
+class IoTrace:
+    """Opt-in ring of fixed-size records of the front panel primitives. Every record keeps the op code, the
+    address, the value and mask, the error code, the timestamp and the high-level action (DeviceActions method)
+    which issued it. Nothing is formatted while recording; the records are decoded on demand.
+
+    Args:
+        size (int, optional): Number of records kept. Defaults to 65536.
+    """
+
+    OP_SET_WIRE_IN = 1
+    OP_UPDATE_WIRE_INS = 2
+    OP_UPDATE_WIRE_OUTS = 3
+    OP_ACTIVATE_TRIGGER_IN = 4
+    OP_UPDATE_TRIGGER_OUTS = 5
+    OP_WRITE_REGISTER = 6
+    OP_READ_REGISTER = 7
+    OP_WRITE_REGISTERS = 8
+    OP_READ_REGISTERS = 9
+    OP_READ_PIPE_OUT = 10
+
+    OP_NAMES = {
+        OP_SET_WIRE_IN: "SetWireInValue",
+        OP_UPDATE_WIRE_INS: "UpdateWireIns",
+        OP_UPDATE_WIRE_OUTS: "UpdateWireOuts",
+        OP_ACTIVATE_TRIGGER_IN: "ActivateTriggerIn",
+        OP_UPDATE_TRIGGER_OUTS: "UpdateTriggerOuts",
+        OP_WRITE_REGISTER: "WriteRegister",
+        OP_READ_REGISTER: "ReadRegister",
+        OP_WRITE_REGISTERS: "WriteRegisters",
+        OP_READ_REGISTERS: "ReadRegisters",
+        OP_READ_PIPE_OUT: "ReadFromBlockPipeOut",
+    }
+
+    RECORD = np.dtype(
+        [
+            ("t", np.float64),
+            ("op", np.uint8),
+            ("action", np.uint16),
+            ("address", np.uint32),
+            ("value", np.uint32),
+            ("mask", np.uint32),
+            ("err", np.int32),
+        ]
+    )
+
+    def __init__(self, size: int = 65536) -> None:
+        self.records = np.zeros(size, self.RECORD)
+        self.size = size
+        self.count = 0
+        self.action_names = ["-"]
+        self.__action_ids = {}
+        self.__local = local()
+
+    def clear(self):
+        self.count = 0
+
+    def record(self, op: int, address: int = 0, value: int = 0, mask: int = 0, err: int = 0):
+        """Store a record in the ring, overwriting the oldest one when it is full"""
+        self.records[self.count % self.size] = (
+            time.perf_counter(),
+            op,
+            getattr(self.__local, "action", 0),
+            address,
+            value & 0xFFFFFFFF,
+            mask & 0xFFFFFFFF,
+            err,
+        )
+        self.count = self.count + 1
+
+    def current_action(self) -> int:
+        return getattr(self.__local, "action", 0)
+
+    @contextmanager
+    def action(self, name: str):
+        """Attribute the records of the calling thread to a high-level action"""
+        action_id = self.__action_ids.get(name)
+        if action_id is None:
+            action_id = len(self.action_names)
+            self.action_names.append(name)
+            self.__action_ids[name] = action_id
+        previous = getattr(self.__local, "action", 0)
+        self.__local.action = action_id
+        try:
+            yield
+        finally:
+            self.__local.action = previous
+
+    def dump(self) -> np.ndarray:
+        """Get a copy of the records kept, oldest first"""
+        if self.count <= self.size:
+            return self.records[: self.count].copy()
+        start = self.count % self.size
+        return np.concatenate((self.records[start:], self.records[:start]))
+
+    def decode(self) -> list:
+        """Get the records kept as text lines, oldest first"""
+        records = self.dump()
+        if records.size == 0:
+            return []
+        t0 = records["t"][0]
+        return [
+            "%10.6f %-20s %-24s addr=0x%02X value=0x%08X mask=0x%08X err=%d"
+            % (
+                record["t"] - t0,
+                self.action_names[record["action"]],
+                self.OP_NAMES.get(int(record["op"]), str(record["op"])),
+                record["address"],
+                record["value"],
+                record["mask"],
+                record["err"],
+            )
+            for record in records
+        ]
+
+    def summary(self) -> dict:
+        """Count the front panel calls of the records kept per high-level action
+
+        Returns:
+            dict: Action names as keys and dictionaries with the primitive names and call counts as values
+        """
+        records = self.dump()
+        summary = {}
+        keys, counts = np.unique(records[["action", "op"]], return_counts=True)
+        for key, count in zip(keys, counts):
+            calls = summary.setdefault(self.action_names[key["action"]], {})
+            calls[self.OP_NAMES.get(int(key["op"]), str(key["op"]))] = int(count)
+        return summary
+
+
+def traced_action(method):
+    """Attribute the front panel calls made by a DeviceActions method to it in the I/O trace (if enabled).
+    Nested actions are attributed to the outermost one."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        trace = self.trace
+        if trace is None or trace.current_action():
+            return method(self, *args, **kwargs)
+        with trace.action(method.__name__):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class DeviceActions:
 
     #
@@ -169,6 +598,16 @@ class DeviceActions:
     #
     DAC_WRITE_MODE = 0x01
 
+    #
+    # Register constants
+    #
+    REGISTER_ENTRIES_CACHE_SIZE = 64
+
+    #
+    # Wait constants
+    #
+    WAIT_KINDS = ("trigger", "adc", "serial", "calibration")  # One CompletionWaiter (and its stats) per kind
+
     #
     # RAM constants
     #
@@ -179,51 +618,120 @@ class DeviceActions:
         self.device = device
         self.links = DeviceLinkAddress()
         self.logger = logger
+        self.wire_snapshot = None
+        self.serial_timing = SerialTiming()
+        self.waiters = {kind: CompletionWaiter() for kind in self.WAIT_KINDS}
+        self.__register_entries = {}
+        self.trace = None
+        self.serial_latency = 0.0
+        self.__serial_done_time = 0.0
+
+    #
+    # I/O trace
+    #
+    def enable_trace(self, size: int = 65536) -> IoTrace:
+        """Start recording every front panel call in a new IoTrace
+
+        Args:
+            size (int, optional): Number of records kept. Defaults to 65536.
+
+        Returns:
+            IoTrace: The trace where the calls are recorded
+        """
+        self.trace = IoTrace(size)
+        return self.trace
+
+    def disable_trace(self):
+        self.trace = None
 
     #
     # Actions
     #
+    @traced_action
     def write_register(self, address, value):
         self.device.__get_lock__()
-        self.device.interface.WriteRegister(address, value)
+        err_code = self.device.interface.WriteRegister(address, value)
         self.device.__release_lock__()
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_WRITE_REGISTER, address, value, err=err_code)
+        return self.__check_err_code(err_code, "Writing register address %d value %d", address, value)
 
+    @traced_action
     def read_register(self, address):
         self.device.__get_lock__()
         value = self.device.interface.ReadRegister(address)
         self.device.__release_lock__()
-        # No error code for this function
-        err_code = self.device.interface.NoError
-        self.__check_err_code(err_code, f"Reading register address {address} -> value {value}")
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_READ_REGISTER, address, value)
         return value
 
+    def __get_register_entries(self, addresses: tuple):
+        """Get the okTRegisterEntries for a list of register addresses. The lists are built once and reused."""
+        entries = self.__register_entries.get(addresses)
+        if entries is None:
+            entries = ok.okTRegisterEntries()
+            for address in addresses:
+                entry = ok.okTRegisterEntry()
+                entry.address = address
+                entries.append(entry)
+            if len(self.__register_entries) >= self.REGISTER_ENTRIES_CACHE_SIZE:
+                self.__register_entries.clear()
+            self.__register_entries[addresses] = entries
+        return entries
+
+    @traced_action
     def write_registers(self, registers):
-        entries = ok.okTRegisterEntries()
-        for register in registers.values():
-            entry = ok.okTRegisterEntry()
-            entry.address = register.address
+        entries = self.__get_register_entries(tuple(register.address for register in registers.values()))
+        for entry, register in zip(entries, registers.values()):
             entry.data = register.value
-            entries.append(entry)
 
         self.device.__get_lock__()
         error_code = self.device.interface.WriteRegisters(entries)
         self.device.__release_lock__()
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_WRITE_REGISTERS, value=len(entries), err=error_code)
         if self.device.interface.NoError == error_code:
             self.logger.info("Device register write success.")
-        else:
-            self.logger.error("Device register write failed with code %s.", error_code)
+            return True
+        self.logger.error("Device register write failed with code %s.", error_code)
+        return False
 
-    def read_registers(self, registers) -> dict:
-        entries = ok.okTRegisterEntries()
+    @traced_action
+    def write_state(self, registers, dacs, mode=None, serial_frames=None):
+        """Write a whole device state in a single session: the device registers in one WriteRegisters call, the
+        DACs and the mode in one wire-in transaction and the chip registers in one serial burst.
 
-        for register in registers.values():
-            entry = ok.okTRegisterEntry()
-            entry.address = register.address
-            entries.append(entry)
+        Args:
+            registers (dict): Device registers with "address" and "value" attributes
+            dacs (dict): DACs with "address", "channel" and "value" attributes
+            mode (int, optional): The chip mode. Defaults to None (not written).
+            serial_frames (list, optional): Serial frames to write to the chip. Defaults to None.
+
+        Returns:
+            tuple: (registers, wires, serial) booleans, True if that part was written without errors
+        """
+        registers_ok = serial_ok = True
+        with self.device.session():
+            if registers:
+                registers_ok = self.write_registers(registers)
+            with self.wire_transaction() as wires:
+                for dac in dacs.values():
+                    self.__queue_dac(wires, dac.address, dac.channel, dac.value)
+                if mode is not None:
+                    wires.set(self.links.win0, mode, WIRE_IN_0.MODES)
+            if serial_frames:
+                serial_ok = self.write_serial_burst(serial_frames)
+        return registers_ok, wires.succeeded, serial_ok
+
+    @traced_action
+    def read_registers(self, registers) -> dict:
+        entries = self.__get_register_entries(tuple(register.address for register in registers.values()))
 
         self.device.__get_lock__()
         error_code = self.device.interface.ReadRegisters(entries)
         self.device.__release_lock__()
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_READ_REGISTERS, value=len(entries), err=error_code)
         if self.device.interface.NoError == error_code:
             self.logger.info("Device register read success.")
             chip_registers = {}
@@ -234,77 +742,120 @@ class DeviceActions:
             self.logger.error("Device register read failed with code %s.", error_code)
             return {}
 
+    @traced_action
     def write_dac(self, address, channel, value):
-        self.__set_wire__(self.links.win_dac, address, WIRE_IN_DAC.DAC_SEL)
-        self.__set_wire__(self.links.win_dac, self.DAC_WRITE_MODE, WIRE_IN_DAC.DAC_MODE)
-        self.__set_wire__(self.links.win_dac, channel, WIRE_IN_DAC.DAC_CHANNEL)
-        self.__set_wire__(self.links.win_dac, value, WIRE_IN_DAC.DAC_VALUE)
-        self.__update_wires__()
-        self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.TRIG_DAC)
+        with self.wire_transaction() as wires:
+            self.__queue_dac(wires, address, channel, value)
+        return wires.succeeded
 
+    @traced_action
     def write_dacs(self, dacs):
-        for dac in dacs.values():
-            self.write_dac(dac.address, dac.channel, dac.value)
-
+        with self.wire_transaction() as wires:
+            for dac in dacs.values():
+                self.__queue_dac(wires, dac.address, dac.channel, dac.value)
+        return wires.succeeded
+
+    def __queue_dac(self, wires, address, channel, value):
+        wires.set(self.links.win_dac, address, WIRE_IN_DAC.DAC_SEL)
+        wires.set(self.links.win_dac, self.DAC_WRITE_MODE, WIRE_IN_DAC.DAC_MODE)
+        wires.set(self.links.win_dac, channel, WIRE_IN_DAC.DAC_CHANNEL)
+        wires.set(self.links.win_dac, value, WIRE_IN_DAC.DAC_VALUE)
+        wires.trigger(self.links.trig_in, TRIGGER_IN_0.TRIG_DAC)
+
+    @traced_action
     def read_adc(self, address, channel) -> int:
-        self.__set_wire__(self.links.win_adc, address, WIRE_IN_ADC.ADC_ID)
-        self.__set_wire__(self.links.win_adc, channel, WIRE_IN_ADC.ADC_CHANNEL)
-        self.__update_wires__()
-        self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.TRIG_ADC)
-
-        data_valid = self.__wait_until(self.is_adc_done, 1)
-        if data_valid:
-            adc_data = self.__read_wire__(self.links.wout_adc, WIRE_OUT_ADC.ADC_DATA)
-        else:
-            adc_data = 0
+        with self.device.session():
+            with self.wire_transaction() as wires:
+                wires.set(self.links.win_adc, address, WIRE_IN_ADC.ADC_ID)
+                wires.set(self.links.win_adc, channel, WIRE_IN_ADC.ADC_CHANNEL)
+                wires.trigger(self.links.trig_in, TRIGGER_IN_0.TRIG_ADC)
+
+            data_valid = self.__poll(self.is_adc_done, 1, "adc")
+            if data_valid:
+                adc_data = self.__read_wire__(self.links.wout_adc, WIRE_OUT_ADC.ADC_DATA)
+            else:
+                adc_data = 0
         return adc_data
         # return random.randint(0,10)
 
+    @traced_action
     def is_adc_done(self) -> bool:
         trigger_out = self.__read_trigger__(self.links.trig_out, TRIGGER_OUT_0.ADC_DATA_VALID)
         return trigger_out
 
+    @traced_action
     def start_capture(self):
-        self.reset_fifo()
-        self.reset_ram()
-        self.__set_wire__(self.links.win0, 1, WIRE_IN_0.WRITE_EN_RAM)
-        self.__update_wires__()
-        self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.START)
-
+        # One lock and one transaction: FIFO and RAM resets, RAM write enable and then the START trigger
+        with self.wire_transaction() as wires:
+            self.__queue_reset_fifo_ram(wires)
+            wires.step()
+            wires.set(self.links.win0, 1, WIRE_IN_0.WRITE_EN_RAM)
+            wires.trigger(self.links.trig_in, TRIGGER_IN_0.START)
+
+    @traced_action
     def stop_capture(self):
         self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.STOP)
 
+    @traced_action
+    def wait_trigger_out(self, trigger, timeout, cancel_event=None) -> bool:
+        """Wait for a trigger-out with low latency (see CompletionWaiter)
+
+        Args:
+            trigger (TRIGGER_DEF): The trigger-out to wait for, e.g. TRIGGER_OUT_0.VIDEO_DONE
+            timeout (float): Maximum time to wait in seconds
+            cancel_event (threading.Event, optional): Event which cancels the wait when it is set. Defaults to None.
+
+        Returns:
+            bool: True if the trigger-out fired, False on timeout or cancellation
+        """
+        return self.waiters["trigger"].wait(
+            lambda: self.__read_trigger__(self.links.trig_out, trigger), timeout, cancel_event
+        )
+
+    @traced_action
     def is_captured(self) -> bool:
         trigger_out = self.__read_trigger__(self.links.trig_out, TRIGGER_OUT_0.VIDEO_DONE)
         return trigger_out
 
+    @traced_action
     def events_done(self) -> bool:
         """Returns a logic 1 if there is a set of events to be read out."""
         trigger_out = self.__read_trigger__(self.links.trig_out, TRIGGER_OUT_0.EVENTS_DONE)
         return trigger_out
 
+    @traced_action
     def reset_chip(self):
         self.__set_wire_as_trigger__(self.links.win0, WIRE_IN_0.RESET_CHIP)
-        self.__update_wires__()
 
+    @traced_action
     def reset_aer(self):
         self.__set_wire_as_trigger__(self.links.win0, WIRE_IN_0.RESET_PERIPH)
-        self.__update_wires__()
 
+    @traced_action
     def reset_device(self):
         self.__set_wire_as_trigger__(self.links.win0, WIRE_IN_0.RESET)
-        self.__update_wires__()
 
+    @traced_action
     def reset_fifo(self):
-        self.__set_wire__(self.links.win0, 0, WIRE_IN_0.READ_EN_RAM)
-        self.__set_wire__(self.links.win0, 0, WIRE_IN_0.WRITE_EN_RAM)
-        self.__set_wire_as_trigger__(self.links.win0, WIRE_IN_0.RESET_FIFO)
-        self.__update_wires__()
+        with self.wire_transaction() as wires:
+            self.__queue_reset_fifo(wires)
+
+    def __queue_reset_fifo(self, wires):
+        wires.set(self.links.win0, 0, WIRE_IN_0.READ_EN_RAM)
+        wires.set(self.links.win0, 0, WIRE_IN_0.WRITE_EN_RAM)
+        wires.pulse(self.links.win0, WIRE_IN_0.RESET_FIFO)
+
+    def __queue_reset_fifo_ram(self, wires):
+        # Every edge keeps its own UpdateWireIns as the gateware expects: FIFO reset 1 -> 0 and then RAM reset 1 -> 0
+        self.__queue_reset_fifo(wires)
+        wires.step()
+        wires.pulse(self.links.win0, WIRE_IN_0.RESET_RAM)
 
+    @traced_action
     def reset_ram(self):
         self.__set_wire_as_trigger__(self.links.win0, WIRE_IN_0.RESET_RAM)
-        self.__update_wires__()
 
+    @traced_action
     def check_calibration(self):
         value = self.__read_wire__(self.links.wout_calib, WIRE_OUT_CALIB.CALIB)
         if value == 0:
@@ -312,67 +863,112 @@ class DeviceActions:
         else:
             return True
 
+    @traced_action
     def enable_clk_chip(self, is_enabled):
-        if is_enabled:
-            self.__set_wire__(self.links.win0, 1, WIRE_IN_0.CLK_20M_EN)
-        else:
-            self.__set_wire__(self.links.win0, 0, WIRE_IN_0.CLK_20M_EN)
-        self.__update_wires__()
+        with self.wire_transaction() as wires:
+            wires.set(self.links.win0, 1 if is_enabled else 0, WIRE_IN_0.CLK_20M_EN)
 
+    @traced_action
     def read_aer(self):
-        addr_x = self.__read_wire__(self.links.wout_xy, WIRE_OUT_XY.X)
-        addr_y = self.__read_wire__(self.links.wout_xy, WIRE_OUT_XY.Y)
+        wires = self.read_wires()
+        addr_x = wires.get(self.links.wout_xy, WIRE_OUT_XY.X)
+        addr_y = wires.get(self.links.wout_xy, WIRE_OUT_XY.Y)
         return addr_x, addr_y
 
-    def read_ram(self, ndata):
-        self.reset_fifo()
-        self.reset_ram()
-        data = self.__read_ram_block(ndata)
-        self.__set_wire__(self.links.win0, 0, WIRE_IN_0.READ_EN_RAM)
-        self.__update_wires__()
+    @traced_action
+    def read_ram(self, ndata, out=None) -> np.ndarray:
+        """Read a full frame from the device RAM.
+
+        Args:
+            ndata (int): Number of bytes to read (rounded down to a multiple of 16)
+            out (np.ndarray, optional): Contiguous np.uint32 array where the data is read. Defaults to None (a new
+            array is allocated).
+
+        Returns:
+            np.ndarray: The np.uint32 words read (a view of "out" if it is given)
+        """
+        with self.device.session():
+            with self.wire_transaction() as wires:
+                self.__queue_reset_fifo_ram(wires)
+            data = self.__read_ram_block(ndata, out)
+            with self.wire_transaction() as wires:
+                wires.set(self.links.win0, 0, WIRE_IN_0.READ_EN_RAM)
         return data
 
-    def read_ram_raw(self, ndata):
-        data = self.__read_ram_block(ndata)
-        self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.EVENTS_READ)
+    @traced_action
+    def read_ram_raw(self, ndata, out=None) -> np.ndarray:
+        """Read a block of raw events from the device RAM. See read_ram for the arguments."""
+        with self.device.session():
+            data = self.__read_ram_block(ndata, out)
+            self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.EVENTS_READ)
         return data
 
-    def __read_ram_block(self, ndata):
-        self.__set_wire__(self.links.win0, 1, WIRE_IN_0.READ_EN_RAM)
-        self.__update_wires__()
+    def __read_ram_block(self, ndata, out=None) -> np.ndarray:
+        with self.wire_transaction() as wires:
+            wires.set(self.links.win0, 1, WIRE_IN_0.READ_EN_RAM)
         # The pipe out read method needs a multiple of 16
         ndata = (ndata // 16) * 16
+        nwords = ndata // 4
+        if out is None:
+            out = np.empty(nwords, np.uint32)
+        elif out.dtype != np.uint32 or not out.flags.c_contiguous or out.size < nwords:
+            raise ValueError(f"The output buffer must be a contiguous np.uint32 array with {nwords} words at least.")
+        data = out.reshape(-1)[:nwords]
+        # Each chunk is read in place through a slice of the byte view of the array
+        view = memoryview(data).cast("B")
         ndata_read = 0
-        data = bytearray()
         while ndata_read < ndata:
-            ndata_to_read = min([self.RAM_READBUF_SIZE, ndata])
-            data_tmp = self.__read_block_pipe_out__(self.links.pipe_out0, ndata_to_read)
-            data.extend(data_tmp)
+            ndata_to_read = min(self.RAM_READBUF_SIZE, ndata - ndata_read)
+            self.__read_block_pipe_out_into__(self.links.pipe_out0, view[ndata_read : ndata_read + ndata_to_read])
             ndata_read = ndata_read + ndata_to_read
         return data
 
+    @traced_action
     def check_addr_ram(self):
-        addr_rd = self.__read_wire__(self.links.wout_ram_read, WIRE_OUT_RAM_READ.ADDR_RD)
-        addr_wr = self.__read_wire__(self.links.wout_ram_write, WIRE_OUT_RAM_WRITE.ADDR_WR)
+        wires = self.read_wires()
+        addr_rd = wires.get(self.links.wout_ram_read, WIRE_OUT_RAM_READ.ADDR_RD)
+        addr_wr = wires.get(self.links.wout_ram_write, WIRE_OUT_RAM_WRITE.ADDR_WR)
         return addr_rd, addr_wr
 
+    @traced_action
     def write_serial(self, data_tx):
         """This function writes 'data' into the TX FIFO of the FPGA's serial controller. Operation is as follows:
         1) The number of bytes to be transmitted is updated as len(data). 2) FPGA serial FIFOs are reset
         (RX data is lost if not read out). 3) Data is loaded to input FIFO and the FPGA automaticatelly sends this data
-        4) A delay of 500 us is implemented to wait for data to be received.
+        4) The bus time is computed from the byte count with 'serial_timing'; the next serial operation waits for it.
 
             Args:
                 data (bytes): List/tuple of bytes containing data to be transmitted. 'data[0] is the first byte
-                that is transmitted."""
-        self.__write_serial_fifo(data_tx)
+                that is transmitted.
+
+            Returns:
+                bool: True if the data was loaded in the TX FIFO without errors."""
+        with self.device.session():
+            return self.__write_serial_fifo(data_tx)
+
+    @traced_action
+    def write_serial_burst(self, frames):
+        """Write several serial frames with a single TX FIFO fill and only one final settle delay. The frames are
+        transmitted back to back, in order, so the chip protocol must accept consecutive frames.
+
+            Args:
+                frames (list): List of frames, each one a list of bytes as in write_serial.
+
+            Returns:
+                bool: True if the frames were loaded in the TX FIFO without errors."""
+        data = [byte for frame in frames if frame is not None for byte in frame]
+        if not data:
+            return True
+        with self.device.session():
+            return self.__write_serial_fifo(data)
 
+    @traced_action
     def read_serial(self):
         """This function reads the RX FIFO of the FPGA's serial controller. Operation is as follows:
         1) If RX FIFO is iniatilly empty, 'None' is returned. This occurs when the slave did not answer
         any query or delay between writing and reading opeartion was too short. 2) RX data is read out until the
         FIFO is empty. For a safe operation, FIFO must have received all data before starting the read process.
-        4) A delay of 500 us is implemented to wait for data to be received.
+        4) The read waits for the bus time of the last write and polls the RX FIFO with exponential backoff.
 
             Returns:
                 data (bytes): List of bytes containing RX data (little endian).
@@ -383,36 +979,67 @@ class DeviceActions:
         data_rx = self.__read_serial_fifo()
         return data_rx
 
+    @traced_action
+    def read_serial_burst(self, nbytes, timeout=0.1):
+        """Read the answer of a serial burst from the RX FIFO in a single pass. Unlike read_serial, it keeps
+        reading until "nbytes" bytes are received or the timeout expires, so the RX data can still be arriving
+        when it is called.
+
+            Args:
+                nbytes (int): Number of bytes expected.
+                timeout (float): Maximum time in seconds to wait for the bytes.
+
+            Returns:
+                data (list): List of bytes containing RX data (little endian). It is shorter than "nbytes" on
+                timeout."""
+        data_read = list()
+        self.__wait_serial_done()
+        fifo_empty = self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_RX_EMPTY)
+        while len(data_read) < nbytes:
+            if fifo_empty:
+                fifo_empty = not self.__poll(
+                    lambda: not self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_RX_EMPTY), timeout, "serial"
+                )
+                if fifo_empty:
+                    self.logger.error("Serial RX timeout: %d of %d bytes received.", len(data_read), nbytes)
+                    break
+            self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.SERIAL_RX_REN)
+            wires = self.read_wires()
+            data_read.append(wires.get(self.links.wout0, WIRE_OUT_0.SERIAL_RX_BYTE))
+            fifo_empty = wires.get(self.links.wout0, WIRE_OUT_0.SERIAL_RX_EMPTY)
+        self.logger.debug("%d bytes read from the serial driver.", len(data_read))
+        return data_read
+
+    @traced_action
     def set_test_mode(self, is_enabled):
-        if is_enabled:
-            self.__set_wire__(self.links.win0, 1, WIRE_IN_0.TEST_TFS_EN)
-            self.__set_wire__(self.links.win0, 1, WIRE_IN_0.CLK_TFS_EN)
-            self.__update_wires__()
-        else:
-            self.__set_wire__(self.links.win0, 0, WIRE_IN_0.TEST_TFS_EN)
-            self.__set_wire__(self.links.win0, 0, WIRE_IN_0.CLK_TFS_EN)
-            self.__update_wires__()
+        value = 1 if is_enabled else 0
+        with self.wire_transaction() as wires:
+            wires.set(self.links.win0, value, WIRE_IN_0.TEST_TFS_EN)
+            wires.set(self.links.win0, value, WIRE_IN_0.CLK_TFS_EN)
 
+    @traced_action
     def set_mode(self, mode):
-        self.__set_wire__(self.links.win0, mode, WIRE_IN_0.MODES)
-        self.__update_wires__()
+        with self.wire_transaction() as wires:
+            wires.set(self.links.win0, mode, WIRE_IN_0.MODES)
+        return wires.succeeded
 
+    @traced_action
     def set_aux_signal(self, signal, value):
         if 0 <= signal <= 5:
             wire = getattr(WIRE_IN_0, f"AUX{signal}")
             self.__set_wire__(self.links.win_pcb, value, wire)
         else:
             self.logger.error(f"Invalid switch_bit: {signal}. Must be between 0 and 5.")
-        self.__update_wires__()
 
+    @traced_action
     def set_pcb_switch(self, switch_bit, value):
         if 0 <= switch_bit <= 31:
             wire = getattr(WIRE_IN_PCBSWITCHES, f"BIT{switch_bit}")
             self.__set_wire__(self.links.win_pcb, value, wire)
         else:
             self.logger.error(f"Invalid switch_bit: {switch_bit}. Must be between 0 and 31.")
-        self.__update_wires__()
 
+    @traced_action
     def get_evt_count(self) -> int:
         evt_cnt = self.__read_wire__(self.links.wout_evt_count, WIRE_OUT_EVT_COUNT.EVT_COUNT)
         return evt_cnt
@@ -421,53 +1048,73 @@ class DeviceActions:
         """This function writes 'data' into the TX FIFO of the FPGA's serial controller. Operation is as follows:
         1) The number of bytes to be transmitted is updated as len(data). 2) FPGA serial FIFOs are reset
         (RX data is lost if not read out). 3) Data is loaded to input FIFO and the FPGA automaticatelly sends this data.
-        4) A delay of 500 us is implemented to wait for data to be received.
+        4) The bus time is computed from the byte count with 'serial_timing'; the next serial operation waits for it.
 
             Args:
                 data (bytes): List/tuple of bytes containing data to be transmitted. 'data[0] is the first
-                byte that is transmitted."""
+                byte that is transmitted.
+
+            Returns:
+                bool: True if all the data was loaded without errors."""
         # 'data' must be a list/tuple of bytes. The LSB is the first byte that is transmitted.
         if data is not None:
+            t0 = time.perf_counter()
+            data = list(data)
             n_bytes = len(data)  # number of bytes to be sent.
             data.reverse()
-            self.__set_register__(self.links.reg_spi, n_bytes)
-            self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.SERIAL_RX_RST_FIFO)
+            # The FIFOs reset would abort the previous transaction if it is still on the bus
+            self.__wait_serial_done()
+            is_ok = self.__set_register__(self.links.reg_spi, n_bytes)
+            is_ok = self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.SERIAL_RX_RST_FIFO) and is_ok
             # Note that if 'n_bytes' is not a multiple of 4, 'data[-x]' will be sent to the FPGA, but will be ignored
             while n_bytes > 0:
-                fifo_full = self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_TX_FULL)
-                while fifo_full:
-                    fifo_full = self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_TX_FULL)
-                    time.sleep(0.01)
-
-                if n_bytes > 0:
-                    self.__set_wire__(self.links.win_spi, data[n_bytes - 1], WIRE_SPI.BYTE3)
-                if n_bytes > 1:
-                    self.__set_wire__(self.links.win_spi, data[n_bytes - 2], WIRE_SPI.BYTE2)
-                if n_bytes > 2:
-                    self.__set_wire__(self.links.win_spi, data[n_bytes - 3], WIRE_SPI.BYTE1)
-                if n_bytes > 3:
-                    self.__set_wire__(self.links.win_spi, data[n_bytes - 4], WIRE_SPI.BYTE0)
-                self.__update_wires__()
-                self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.SERIAL_TX_WEN)
+                is_ready = self.__poll(
+                    lambda: not self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_TX_FULL),
+                    self.serial_timing.timeout,
+                    "serial",
+                )
+                if not is_ready:
+                    self.logger.error("Serial TX FIFO full timeout.")
+                    return False
+
+                with self.wire_transaction() as wires:
+                    if n_bytes > 0:
+                        wires.set(self.links.win_spi, data[n_bytes - 1], WIRE_SPI.BYTE3)
+                    if n_bytes > 1:
+                        wires.set(self.links.win_spi, data[n_bytes - 2], WIRE_SPI.BYTE2)
+                    if n_bytes > 2:
+                        wires.set(self.links.win_spi, data[n_bytes - 3], WIRE_SPI.BYTE1)
+                    if n_bytes > 3:
+                        wires.set(self.links.win_spi, data[n_bytes - 4], WIRE_SPI.BYTE0)
+                    wires.trigger(self.links.trig_in, TRIGGER_IN_0.SERIAL_TX_WEN)
+                is_ok = wires.succeeded and is_ok
                 n_bytes = n_bytes - 4
-            self.logger.debug(f"{len(data)} bytes sent to the serial driver.")
-            time.sleep(0.0005)  # Waiting for RX data
-        else:
-            self.logger.error("Serial TX data is None.")
+            # The last byte leaves the FIFO once the bus has shifted all of them out
+            self.__serial_done_time = time.perf_counter() + self.serial_timing.transfer_time(len(data))
+            self.serial_latency = self.__serial_done_time - t0
+            self.logger.debug("%d bytes sent to the serial driver in %.3f ms.", len(data), self.serial_latency * 1e3)
+            return is_ok
+        self.logger.error("Serial TX data is None.")
+        return False
 
     def __read_serial_fifo(self):
         """This function reads the RX FIFO of the FPGA's serial controller. Operation is as follows:
         1) If RX FIFO is iniatilly empty, 'None' is returned. This occurs when the slave did not answer
         any query or delay between writing and reading opeartion was too short. 2) RX data is read out until the
         FIFO is empty. For a safe operation, FIFO must have received all data before starting the read process.
-        4) A delay of 500 us is implemented to wait for data to be received.
+        4) The read waits for the bus time of the last write and polls the RX FIFO with exponential backoff.
 
             Returns:
                 data (bytes): List of bytes containing RX data (little endian).
                 None if RX FIFO is initially empty.
         """
         data_read = list()
-        fifo_empty = self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_RX_EMPTY)
+        self.__wait_serial_done()
+        fifo_empty = not self.__poll(
+            lambda: not self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_RX_EMPTY),
+            self.serial_timing.rx_timeout,
+            "serial",
+        )
         if fifo_empty:
             self.logger.error(
                 "No RX data found in serial fifo. Make sure the device is answering or delay is long enough."
@@ -476,13 +1123,57 @@ class DeviceActions:
         else:
             while not fifo_empty:
                 self.__set_trigger__(self.links.trig_in, TRIGGER_IN_0.SERIAL_RX_REN)
-                byte_rx = self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_RX_BYTE)
-                data_read.append(byte_rx)
-                fifo_empty = self.__read_wire__(self.links.wout0, WIRE_OUT_0.SERIAL_RX_EMPTY)
-            self.logger.debug(f"{len(data_read)} bytes read from the serial driver.")
+                wires = self.read_wires()
+                data_read.append(wires.get(self.links.wout0, WIRE_OUT_0.SERIAL_RX_BYTE))
+                fifo_empty = wires.get(self.links.wout0, WIRE_OUT_0.SERIAL_RX_EMPTY)
+            self.logger.debug("%d bytes read from the serial driver.", len(data_read))
             # data_read.reverse()
             return data_read
 
+    def wire_transaction(self) -> "WireInTransaction":
+        """Create a wire-in transaction. The queued wire-in changes and trigger-ins are sent to the device,
+        in order, with a single lock acquisition when the transaction is committed (on exit if it is used
+        as a context manager).
+
+            with actions.wire_transaction() as wires:
+                wires.set(links.win0, 1, WIRE_IN_0.READ_EN_RAM)
+                wires.trigger(links.trig_in, TRIGGER_IN_0.START)
+
+        Returns:
+            WireInTransaction: The empty transaction
+        """
+        return WireInTransaction(self)
+
+    def read_wires(self, max_age: float = 0.0) -> "WireOutSnapshot":
+        """Refresh all the wire-outs with a single UpdateWireOuts and return their values. Any number of
+        WIRE_OUT_* fields can then be decoded from the snapshot without more USB transactions.
+
+            wires = actions.read_wires()
+            addr_x = wires.get(links.wout_xy, WIRE_OUT_XY.X)
+            addr_y = wires.get(links.wout_xy, WIRE_OUT_XY.Y)
+
+        Args:
+            max_age (float, optional): The last snapshot is reused if it is younger than this time in seconds.
+            Defaults to 0.0 (always refresh).
+
+        Returns:
+            WireOutSnapshot: The wire-out values
+        """
+        snapshot = self.wire_snapshot
+        if max_age > 0 and snapshot is not None and time.perf_counter() - snapshot.timestamp < max_age:
+            return snapshot
+        interface = self.device.interface
+        self.device.__get_lock__()
+        err_code = interface.UpdateWireOuts()
+        values = {address: interface.GetWireOutValue(address) for address in self.links.wire_outs}
+        self.device.__release_lock__()
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_UPDATE_WIRE_OUTS, err=err_code)
+        self.__check_err_code(err_code, "Update wire outs")
+        snapshot = WireOutSnapshot(values, time.perf_counter())
+        self.wire_snapshot = snapshot
+        return snapshot
+
     #
     # Device IO functions
     #
@@ -490,7 +1181,9 @@ class DeviceActions:
         self.device.__get_lock__()
         err_code = self.device.interface.ActivateTriggerIn(address, trigger.offset)
         self.device.__release_lock__()
-        self.__check_err_code(err_code, f"Activate trigger address {address} bit {trigger.offset}")
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_ACTIVATE_TRIGGER_IN, address, trigger.offset, trigger.mask, err_code)
+        return self.__check_err_code(err_code, "Activate trigger address %d bit %d", address, trigger.offset)
 
     def __read_trigger__(self, address, trigger):
         self.device.__get_lock__()
@@ -498,73 +1191,308 @@ class DeviceActions:
         self.__check_err_code(err_code, "Update trigger out")
         trigger_out = self.device.interface.IsTriggered(address, trigger.mask)
         self.device.__release_lock__()
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_UPDATE_TRIGGER_OUTS, address, trigger_out, trigger.mask, err_code)
         return trigger_out
 
     def __set_wire_as_trigger__(self, address, wire):
-        self.__set_wire__(address, 1, wire)
-        self.__update_wires__()
-        self.__set_wire__(address, 0, wire)
-        self.__update_wires__()
+        with self.wire_transaction() as wires:
+            wires.pulse(address, wire)
 
-    def __read_wire__(self, address, wire):
-        self.device.__get_lock__()
-        err_code = self.device.interface.UpdateWireOuts()
-        self.__check_err_code(err_code, f"Read wire out {address}")
-        wire_data = self.device.interface.GetWireOutValue(address)
-        self.device.__release_lock__()
-        return (wire_data & wire.mask) >> wire.offset
+    def __read_wire__(self, address, wire, max_age=0.0):
+        return self.read_wires(max_age).get(address, wire)
 
     def __set_wire__(self, address, value, wire):
-        self.device.__get_lock__()
-        to_write_value = value << wire.offset
-        err_code = self.device.interface.SetWireInValue(address, to_write_value, wire.mask)
-        self.device.__release_lock__()
-        self.__check_err_code(
-            err_code,
-            f"Set wire -> bits {format(to_write_value, '#032b')} -> mask {format(wire.mask,'#032b')} in address {address}",
-        )
+        with self.wire_transaction() as wires:
+            wires.set(address, value, wire)
 
     def __update_wires__(self):
         self.device.__get_lock__()
         err_code = self.device.interface.UpdateWireIns()
         self.device.__release_lock__()
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_UPDATE_WIRE_INS, err=err_code)
         self.__check_err_code(err_code, "Update wire in")
 
+    def __commit_wires__(self, steps):
+        """Send the steps of a wire-in transaction holding the device lock only once.
+
+        Args:
+            steps (list): List of (wires, triggers) tuples. "wires" maps a wire-in address to its (value, mask)
+            and "triggers" is a list of (address, TRIGGER_DEF) activated after updating the wire-ins.
+
+        Returns:
+            bool: True if all the calls succeeded
+        """
+        interface = self.device.interface
+        trace = self.trace
+        err_codes = []
+        self.device.__get_lock__()
+        try:
+            for wires, triggers in steps:
+                for address, (value, mask) in wires.items():
+                    err_code = interface.SetWireInValue(address, value, mask)
+                    err_codes.append((err_code, address))
+                    if trace is not None:
+                        trace.record(IoTrace.OP_SET_WIRE_IN, address, value, mask, err_code)
+                if wires:
+                    err_code = interface.UpdateWireIns()
+                    err_codes.append((err_code, 0))
+                    if trace is not None:
+                        trace.record(IoTrace.OP_UPDATE_WIRE_INS, err=err_code)
+                for address, trigger in triggers:
+                    err_code = interface.ActivateTriggerIn(address, trigger.offset)
+                    err_codes.append((err_code, address))
+                    if trace is not None:
+                        trace.record(IoTrace.OP_ACTIVATE_TRIGGER_IN, address, trigger.offset, trigger.mask, err_code)
+        finally:
+            self.device.__release_lock__()
+        is_ok = True
+        for err_code, address in err_codes:
+            if err_code != interface.NoError:
+                is_ok = self.__check_err_code(err_code, "Wire-in transaction on address %d", address)
+        self.logger.debug("Wire-in transaction with %d steps sent.", len(steps))
+        return is_ok
+
     def __read_block_pipe_out__(self, address, length):
         out = bytearray(length)
+        self.__read_block_pipe_out_into__(address, memoryview(out))
+        return out
+
+    def __read_block_pipe_out_into__(self, address, buffer: memoryview) -> int:
+        length = len(buffer)
         self.device.__get_lock__()
-        err_code = self.device.interface.ReadFromBlockPipeOut(address, self.RAM_BLOCK_SIZE, out)
-        self.device.__release_lock__()
+        try:
+            try:
+                err_code = self.device.interface.ReadFromBlockPipeOut(address, self.RAM_BLOCK_SIZE, buffer)
+            except TypeError:
+                # FrontPanel wrappers which only accept bytearray objects need a temporary copy
+                tmp = bytearray(length)
+                err_code = self.device.interface.ReadFromBlockPipeOut(address, self.RAM_BLOCK_SIZE, tmp)
+                buffer[:] = tmp
+        finally:
+            self.device.__release_lock__()
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_READ_PIPE_OUT, address, length, err=min(err_code, 0))
         if err_code < 0:
-            self.__check_err_code(err_code, f"Read pipe block with address {address}")
+            buffer[:] = bytes(length)
+            self.__check_err_code(err_code, "Read pipe block with address %d", address)
         else:
-            self.logger.debug(f"Query {length} bytes \t Read {err_code} bytes")
-
-        return out
+            self.logger.debug("Query %d bytes \t Read %d bytes", length, err_code)
+        return err_code
 
     def __set_register__(self, address, value):
         self.device.__get_lock__()
         err_code = self.device.interface.WriteRegister(address, value)
         self.device.__release_lock__()
-        self.__check_err_code(err_code, f"Writing register address {address} value {value}")
+        if self.trace is not None:
+            self.trace.record(IoTrace.OP_WRITE_REGISTER, address, value, err=err_code)
+        return self.__check_err_code(err_code, "Writing register address %d value %d", address, value)
 
     #
     # Auxiliar functions
     #
-    def __check_err_code(self, err_code, msg=""):
+    def __check_err_code(self, err_code, msg="", *args):
+        """Log a front panel error. The message is a logging format string with its arguments, so nothing is
+        formatted unless the call failed.
+
+        Returns:
+            bool: True if there isn't any error
+        """
         if err_code != self.device.interface.NoError:
-            self.logger.error(msg + f" failed with code({err_code}).")
-            self.logger.error(f"Opal kelly error message: {self.device.interface.GetLastErrorMessage()}")
-        else:
-            self.logger.debug(msg + " OK.")
+            self.logger.error(msg + " failed with code(%d).", *args, err_code)
+            self.logger.error("Opal kelly error message: %s", self.device.interface.GetLastErrorMessage())
+            return False
+        return True
+
+    def __wait_serial_done(self):
+        """Sleep until the bus time of the last serial transaction has elapsed"""
+        remaining = self.__serial_done_time - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def __poll(self, predicate, timeout, kind) -> bool:
+        return self.waiters[kind].wait(predicate, timeout)
 
-    def __wait_until(self, somepredicate, timeout, period=0.01, *args, **kwargs):
-        mustend = time.time() + timeout
-        while time.time() < mustend:
-            if somepredicate(*args, **kwargs):
+
+class CompletionWaiter:
+    """Wait for a completion condition (trigger-outs, FIFO flags...) with low latency. The predicate is polled back
+    to back during "spin_time" and then with an exponential backoff from "period_min" to "period_max". The wait
+    can be cancelled immediately through a threading.Event.
+
+    The statistics keep the number of waits, the time waiting and the detection latency, i.e. the time between
+    the last check that failed and the one that detected the condition (upper bound of the time lost).
+    """
+
+    def __init__(self, spin_time: float = 200e-6, period_min: float = 50e-6, period_max: float = 5e-3) -> None:
+        self.spin_time = spin_time
+        self.period_min = period_min
+        self.period_max = period_max
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.wait_count = 0
+        self.timeout_count = 0
+        self.wait_time = 0.0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+
+    def wait(self, predicate, timeout: float, cancel_event=None, period_max: float = None) -> bool:
+        """Wait until the predicate is met
+
+        Args:
+            predicate (callable): The condition to wait for
+            timeout (float): Maximum time to wait in seconds
+            cancel_event (threading.Event, optional): Event which cancels the wait when it is set. Defaults to None.
+            period_max (float, optional): Overrides the maximum backoff period. Defaults to None.
+
+        Returns:
+            bool: True if the predicate is met, False on timeout or cancellation
+        """
+        if period_max is None:
+            period_max = self.period_max
+        t0 = time.perf_counter()
+        t_end = t0 + timeout
+        t_check = t0
+        period = self.period_min
+        while True:
+            if predicate():
+                now = time.perf_counter()
+                self.wait_count = self.wait_count + 1
+                self.wait_time = self.wait_time + now - t0
+                self.last_latency = now - t_check
+                self.max_latency = max(self.max_latency, self.last_latency)
                 return True
-            time.sleep(period)
-        return False
+            t_check = time.perf_counter()
+            if t_check >= t_end:
+                self.timeout_count = self.timeout_count + 1
+                return False
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            if t_check - t0 < self.spin_time:
+                continue
+            sleep_time = min(period, t_end - t_check)
+            if cancel_event is not None:
+                if cancel_event.wait(sleep_time):
+                    return False
+            else:
+                time.sleep(sleep_time)
+            period = min(2 * period, period_max)
+
+
+class SerialTiming:
+    """Timing model of the FPGA serial (SPI) controller used to wait the minimum time a transaction needs"""
+
+    def __init__(
+        self, clock: float = 1e6, byte_gap: float = 0.0, overhead: float = 10e-6, timeout: float = 1.0, rx_timeout=0.01
+    ) -> None:
+        """
+        Args:
+            clock (float, optional): SPI clock frequency in Hz. Defaults to 1e6.
+            byte_gap (float, optional): Idle time between bytes in seconds. Defaults to 0.0.
+            overhead (float, optional): Fixed time per transaction in seconds (chip select, FIFO latency...).
+            Defaults to 10e-6.
+            timeout (float, optional): Maximum time waiting for room in the TX FIFO in seconds. Defaults to 1.0.
+            rx_timeout (float, optional): Maximum time waiting for the first RX byte in seconds. Defaults to 0.01.
+        """
+        self.clock = clock
+        self.byte_gap = byte_gap
+        self.overhead = overhead
+        self.timeout = timeout
+        self.rx_timeout = rx_timeout
+
+    @classmethod
+    def from_config(cls, config):
+        """Create the timing model from the "serial" section of the model configuration"""
+        return cls(
+            clock=float(getattr(config, "clock", 1e6)),
+            byte_gap=float(getattr(config, "byte_gap", 0.0)),
+            overhead=float(getattr(config, "overhead", 10e-6)),
+            timeout=float(getattr(config, "timeout", 1.0)),
+            rx_timeout=float(getattr(config, "rx_timeout", 0.01)),
+        )
+
+    def transfer_time(self, nbytes: int) -> float:
+        """Minimum time in seconds to shift "nbytes" bytes through the bus"""
+        return self.overhead + nbytes * (8 / self.clock + self.byte_gap)
+
+
+class WireInTransaction:
+    """Wire-in changes and trigger-ins queued to be committed with a single lock acquisition.
+
+    Changes on several fields of the same wire-in are merged, so every step of the transaction costs one
+    SetWireInValue per wire-in address and one UpdateWireIns, followed by the queued trigger-ins.
+    """
+
+    def __init__(self, actions: DeviceActions) -> None:
+        self.actions = actions
+        self.steps = []
+        self.succeeded = True  # False once a commit fails
+        self.step()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    def set(self, address, value, wire: "LINK_VALUE_DEF"):
+        """Queue a value for one field of a wire-in
+
+        Args:
+            address (int): The wire-in address
+            value (int): The field value
+            wire (LINK_VALUE_DEF): The field definition
+        """
+        wires = self.steps[-1][0]
+        wire_value, wire_mask = wires.get(address, (0, 0))
+        wire_value = (wire_value & ~wire.mask) | ((value << wire.offset) & wire.mask)
+        wires[address] = (wire_value, wire_mask | wire.mask)
+
+    def pulse(self, address, wire: "LINK_VALUE_DEF"):
+        """Queue a 1 -> 0 pulse on a wire-in field (a wire used as trigger)"""
+        self.set(address, 1, wire)
+        self.step()
+        self.set(address, 0, wire)
+
+    def trigger(self, address, trigger: "TRIGGER_DEF"):
+        """Queue a trigger-in, activated once the wire-ins queued before it are updated"""
+        self.steps[-1][1].append((address, trigger))
+        self.step()
+
+    def step(self):
+        """Close the current step, the next changes are updated after it"""
+        if not self.steps or self.steps[-1][0] or self.steps[-1][1]:
+            self.steps.append(({}, []))
+
+    def commit(self):
+        """Send the queued changes to the device"""
+        steps = [step for step in self.steps if step[0] or step[1]]
+        if steps and not self.actions.__commit_wires__(steps):
+            self.succeeded = False
+        self.steps = []
+        self.step()
+
+
+class WireOutSnapshot:
+    """Values of all the wire-outs captured with a single UpdateWireOuts"""
+
+    def __init__(self, values: dict, timestamp: float) -> None:
+        self.values = values
+        self.timestamp = timestamp
+
+    def get(self, address, wire: "LINK_VALUE_DEF") -> int:
+        """Decode a field of a wire-out
+
+        Args:
+            address (int): The wire-out address
+            wire (LINK_VALUE_DEF): The field definition
+
+        Returns:
+            int: The field value
+        """
+        return (self.values[address] & wire.mask) >> wire.offset
 
 
 class DeviceLinkAddress:
@@ -588,6 +1516,16 @@ class DeviceLinkAddress:
         self.trig_in = 0x41
         self.trig_out = 0x60
         self.pipe_out0 = 0xA0
+        # Wire-outs refreshed in every snapshot
+        self.wire_outs = (
+            self.wout_calib,
+            self.wout0,
+            self.wout_xy,
+            self.wout_adc,
+            self.wout_evt_count,
+            self.wout_ram_read,
+            self.wout_ram_write,
+        )
 
 
 class LINK_VALUE_DEF:
@@ -0,0 +1,371 @@
+""" Simulated Opal Kelly front panel """
+
+import logging
+import time
+import numpy as np
+
+
+class SimFrontPanel:
+    """In-process replacement of ok.okCFrontPanel.
+
+    It implements the wire-in/wire-out, trigger, register and block pipe out surface used by
+    DeviceActions with a simple model of the FPGA gateware behind it, so the capture loops can run
+    without a board. Every USB transaction costs a configurable latency and the pipe transfers are
+    limited by a configurable bandwidth (0 means an ideal link).
+    """
+
+    NoError = 0
+    Failed = -1
+    InvalidEndpoint = -2
+
+    SERIAL = "SIM000000"
+
+    def __init__(
+        self,
+        usb_latency: float = 0.0,
+        pipe_bandwidth: float = 0.0,
+        capture_time: float = 0.01,
+        event_rate: float = 1e6,
+        adc_value: int = 2048,
+    ):
+        # Lazy import to avoid a circular import when the FrontPanel SDK is not installed
+        from TAER_Core.Libs.dev_opal_kelly import (
+            DeviceLinkAddress,
+            TRIGGER_IN_0,
+            TRIGGER_OUT_0,
+            WIRE_IN_0,
+            WIRE_IN_ADC,
+            WIRE_OUT_0,
+            WIRE_SPI,
+        )
+
+        self.logger = logging.getLogger(__name__)
+        self.links = DeviceLinkAddress()
+        self.__trig_in = TRIGGER_IN_0
+        self.__trig_out = TRIGGER_OUT_0
+        self.__win0 = WIRE_IN_0
+        self.__win_adc = WIRE_IN_ADC
+        self.__wout0 = WIRE_OUT_0
+        self.__win_spi = WIRE_SPI
+        # Link model
+        self.usb_latency = usb_latency
+        self.pipe_bandwidth = pipe_bandwidth
+        # Gateware model
+        self.capture_time = capture_time
+        self.event_rate = event_rate
+        self.adc_value = adc_value
+        self.serial = self.SERIAL
+        self.call_count = {}
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a simulated front panel from the "simulator" section of the model configuration"""
+        return cls(
+            usb_latency=float(getattr(config, "usb_latency", 0.0)),
+            pipe_bandwidth=float(getattr(config, "pipe_bandwidth", 0.0)),
+            capture_time=float(getattr(config, "capture_time", 0.01)),
+            event_rate=float(getattr(config, "event_rate", 1e6)),
+            adc_value=int(getattr(config, "adc_value", 2048)),
+        )
+
+    def reset(self):
+        """Clear the simulated gateware state"""
+        self.__is_open = False
+        self.__wire_in_pending = {}
+        self.__wire_in = {}
+        self.__wire_out = {}
+        self.__registers = {}
+        self.__trigger_out = 0
+        self.__trigger_out_latched = 0
+        self.__capturing = False
+        self.__t_start = 0.0
+        self.__t_next_done = 0.0
+        self.__adc_pending = False
+        self.__spi_tx = []
+        self.__spi_tx_count = 0
+        self.__spi_rx = []
+        self.__spi_rx_byte = 0
+        self.__chip_registers = {}
+        self.__pipe_word = 0
+
+    def reset_call_count(self):
+        self.call_count = {}
+
+    def open(self):
+        self.__is_open = True
+
+    #
+    # ok.okCFrontPanel interface
+    #
+    def IsOpen(self) -> bool:
+        return self.__is_open
+
+    def Close(self):
+        self.__is_open = False
+
+    def GetDeviceInfo(self, info) -> int:
+        self.__transaction("GetDeviceInfo")
+        info.productName = "Simulated XEM"
+        info.serialNumber = self.serial
+        info.deviceMajorVersion = 1
+        info.deviceMinorVersion = 0
+        return self.NoError
+
+    def GetLastErrorMessage(self) -> str:
+        return ""
+
+    def LoadDefaultPLLConfiguration(self) -> int:
+        self.__transaction("LoadDefaultPLLConfiguration")
+        return self.NoError
+
+    def ConfigureFPGA(self, bit_stream_path: str) -> int:
+        self.__transaction("ConfigureFPGA")
+        is_open = self.__is_open
+        self.reset()
+        self.__is_open = is_open
+        return self.NoError
+
+    def IsFrontPanelEnabled(self) -> bool:
+        self.__transaction("IsFrontPanelEnabled")
+        return True
+
+    def SetWireInValue(self, address: int, value: int, mask: int = 0xFFFFFFFF) -> int:
+        current = self.__wire_in_pending.get(address, self.__wire_in.get(address, 0))
+        self.__wire_in_pending[address] = (current & ~mask) | (value & mask)
+        return self.NoError
+
+    def UpdateWireIns(self) -> int:
+        self.__transaction("UpdateWireIns")
+        for address, value in self.__wire_in_pending.items():
+            previous = self.__wire_in.get(address, 0)
+            self.__wire_in[address] = value
+            if address == self.links.win0:
+                self.__on_wire_in_0(previous, value)
+        self.__wire_in_pending = {}
+        return self.NoError
+
+    def UpdateWireOuts(self) -> int:
+        self.__transaction("UpdateWireOuts")
+        self.__update_wire_outs()
+        return self.NoError
+
+    def GetWireOutValue(self, address: int) -> int:
+        return self.__wire_out.get(address, 0)
+
+    def ActivateTriggerIn(self, address: int, bit: int) -> int:
+        self.__transaction("ActivateTriggerIn")
+        if address != self.links.trig_in:
+            return self.InvalidEndpoint
+        self.__on_trigger_in(bit)
+        return self.NoError
+
+    def UpdateTriggerOuts(self) -> int:
+        self.__transaction("UpdateTriggerOuts")
+        self.__update_trigger_outs()
+        self.__trigger_out_latched = self.__trigger_out
+        self.__trigger_out = 0
+        return self.NoError
+
+    def IsTriggered(self, address: int, mask: int) -> bool:
+        if address != self.links.trig_out:
+            return False
+        return (self.__trigger_out_latched & mask) != 0
+
+    def WriteRegister(self, address: int, value: int) -> int:
+        self.__transaction("WriteRegister")
+        self.__registers[address] = value
+        return self.NoError
+
+    def ReadRegister(self, address: int) -> int:
+        self.__transaction("ReadRegister")
+        return self.__registers.get(address, 0)
+
+    def WriteRegisters(self, entries) -> int:
+        self.__transaction("WriteRegisters")
+        for entry in entries:
+            self.__registers[entry.address] = entry.data
+        return self.NoError
+
+    def ReadRegisters(self, entries) -> int:
+        self.__transaction("ReadRegisters")
+        for entry in entries:
+            entry.data = self.__registers.get(entry.address, 0)
+        return self.NoError
+
+    def ReadFromBlockPipeOut(self, address: int, block_size: int, data) -> int:
+        length = len(data)
+        self.__transaction("ReadFromBlockPipeOut", length)
+        if address != self.links.pipe_out0:
+            return self.InvalidEndpoint
+        # Synthetic data: a free-running 32-bit counter (monotonic timestamps for the raw modes)
+        nwords = length // 4
+        words = np.frombuffer(data, np.uint32, nwords)
+        np.add(np.arange(nwords, dtype=np.uint32), np.uint32(self.__pipe_word), out=words)
+        self.__pipe_word = (self.__pipe_word + nwords) & 0xFFFFFFFF
+        return length
+
+    #
+    # Gateware model
+    #
+    def __transaction(self, name: str, nbytes: int = 0):
+        self.call_count[name] = self.call_count.get(name, 0) + 1
+        delay = self.usb_latency
+        if nbytes and self.pipe_bandwidth > 0:
+            delay = delay + nbytes / self.pipe_bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    def __on_wire_in_0(self, previous: int, value: int):
+        rising = value & ~previous
+        if rising & self.__win0.RESET.mask:
+            self.__capturing = False
+            self.__trigger_out = 0
+
+    def __on_trigger_in(self, bit: int):
+        trig = self.__trig_in
+        if bit == trig.START.offset:
+            self.__capturing = True
+            self.__t_start = time.perf_counter()
+            self.__t_next_done = self.__t_start + self.capture_time
+        elif bit == trig.STOP.offset:
+            self.__capturing = False
+        elif bit == trig.TRIG_ADC.offset:
+            self.__adc_pending = True
+        elif bit == trig.SERIAL_RX_RST_FIFO.offset:
+            self.__spi_tx = []
+            self.__spi_tx_count = 0
+            self.__spi_rx = []
+        elif bit == trig.SERIAL_TX_WEN.offset:
+            self.__on_serial_tx()
+        elif bit == trig.SERIAL_RX_REN.offset:
+            if self.__spi_rx:
+                self.__spi_rx_byte = self.__spi_rx.pop(0)
+
+    def __on_serial_tx(self):
+        # The TX word carries up to 4 bytes, BYTE3 is the first one transmitted
+        n_bytes = max(0, min(4, self.__registers.get(self.links.reg_spi, 0) - self.__spi_tx_count))
+        word = self.__wire_in.get(self.links.win_spi, 0)
+        spi = self.__win_spi
+        for wire in (spi.BYTE3, spi.BYTE2, spi.BYTE1, spi.BYTE0)[:n_bytes]:
+            self.__spi_tx.append((word & wire.mask) >> wire.offset)
+        self.__spi_tx_count = self.__spi_tx_count + n_bytes
+        # Default chip protocol: {addr | 0x80, value} writes, {addr, 0} reads and answers {0, value}
+        while len(self.__spi_tx) >= 2:
+            address, value = self.__spi_tx[0], self.__spi_tx[1]
+            self.__spi_tx = self.__spi_tx[2:]
+            if address & 0x80:
+                self.__chip_registers[address & 0x7F] = value
+                self.__spi_rx.extend([0, 0])
+            else:
+                self.__spi_rx.extend([0, self.__chip_registers.get(address & 0x7F, 0)])
+
+    def __update_trigger_outs(self):
+        trig = self.__trig_out
+        if self.__capturing and time.perf_counter() >= self.__t_next_done:
+            self.__trigger_out |= trig.FRAME_DONE.mask | trig.VIDEO_DONE.mask | trig.EVENTS_DONE.mask
+            self.__t_next_done = time.perf_counter() + self.capture_time
+        if self.__adc_pending:
+            self.__trigger_out |= trig.ADC_DATA_VALID.mask
+            self.__adc_pending = False
+
+    def __update_wire_outs(self):
+        links = self.links
+        wout0 = self.__wout0
+        value = self.__spi_rx_byte << wout0.SERIAL_RX_BYTE.offset
+        if not self.__spi_rx:
+            value |= wout0.SERIAL_RX_EMPTY.mask
+        self.__wire_out[links.wout0] = value
+        self.__wire_out[links.wout_calib] = 1
+        adc_sel = self.__wire_in.get(links.win_adc, 0)
+        adc_id = (adc_sel & self.__win_adc.ADC_ID.mask) >> self.__win_adc.ADC_ID.offset
+        adc_channel = (adc_sel & self.__win_adc.ADC_CHANNEL.mask) >> self.__win_adc.ADC_CHANNEL.offset
+        self.__wire_out[links.wout_adc] = (self.adc_value + 16 * adc_id + adc_channel) & 0xFFF
+        if self.__capturing:
+            elapsed = time.perf_counter() - self.__t_start
+            self.__wire_out[links.wout_evt_count] = int(elapsed * self.event_rate) & 0xFFFFFFFF
+        self.__wire_out[links.wout_ram_read] = 0
+        self.__wire_out[links.wout_ram_write] = 0
+
+
+class SimDeviceInfo:
+    """Replacement of ok.okTDeviceInfo"""
+
+    def __init__(self):
+        self.productName = ""
+        self.serialNumber = ""
+        self.deviceMajorVersion = 0
+        self.deviceMinorVersion = 0
+
+
+class SimRegisterEntry:
+    """Replacement of ok.okTRegisterEntry"""
+
+    def __init__(self):
+        self.address = 0
+        self.data = 0
+
+
+class SimRegisterEntries(list):
+    """Replacement of ok.okTRegisterEntries"""
+
+
+class SimFrontPanelManager:
+    """Replacement of ok.FrontPanelManager. There is no USB monitoring, the simulated board is
+    attached through Device.use_simulator."""
+
+    def __init__(self):
+        pass
+
+    def StartMonitoring(self):
+        pass
+
+    def StopMonitoring(self):
+        pass
+
+    def Open(self, serial: str):
+        front_panel = SimFrontPanel()
+        front_panel.open()
+        return front_panel
+
+
+# Names matching the FrontPanel SDK so this module can be used in place of "ok"
+okCFrontPanel = SimFrontPanel
+okTDeviceInfo = SimDeviceInfo
+okTRegisterEntry = SimRegisterEntry
+okTRegisterEntries = SimRegisterEntries
+FrontPanelManager = SimFrontPanelManager
+
+
+def benchmark(nframes: int = 100, ndata: int = 64 * 64 * 4, **kwargs) -> dict:
+    """Measure the frame readout throughput of DeviceActions against a simulated board
+
+    Args:
+        nframes (int, optional): Number of frames captured. Defaults to 100.
+        ndata (int, optional): Bytes read per frame. Defaults to 64 * 64 * 4.
+        kwargs: Arguments of SimFrontPanel (usb_latency, pipe_bandwidth, capture_time...)
+
+    Returns:
+        dict: Frames per second, MB/s read and the number of calls per front panel primitive
+    """
+    from TAER_Core.Libs.dev_opal_kelly import TRIGGER_OUT_0, Device
+
+    kwargs.setdefault("capture_time", 0.0)
+    front_panel = SimFrontPanel(**kwargs)
+    device = Device()
+    device.use_simulator(front_panel)
+    device.start()
+    front_panel.reset_call_count()
+    data = None
+    t0 = time.perf_counter()
+    for _ in range(nframes):
+        device.actions.start_capture()
+        device.actions.wait_trigger_out(TRIGGER_OUT_0.VIDEO_DONE, 1.0)
+        data = device.actions.read_ram(ndata, data)
+    elapsed = time.perf_counter() - t0
+    device.stop()
+    return {
+        "fps": nframes / elapsed,
+        "mbps": nframes * ndata / elapsed / 1e6,
+        "calls": dict(front_panel.call_count),
+    }
@@ -1,3 +1,4 @@
+import numpy as np
 import wx
 from TAER_Core.Views.auxiliar_view_base import AuxViewBase
 from wx.lib import plot as wxplot
@@ -99,7 +100,8 @@ class AdcMenuPanel(wx.Panel):
     def update_channels(self, values, ts):
         if self.init_flag:
             for channel in values.values():
-                self.values_widgets[channel.label].SetValue(str(channel.data_y[-1]))
+                if channel.n_samples:
+                    self.values_widgets[channel.label].SetValue(str(channel.data_y[-1]))
                 # self.enable_widgets[channel.label].SetValue(channel.IsEnabled)
         else:
             self.__init_adc_values(values)
@@ -155,7 +157,8 @@ class AdcPlotPanel(wx.Panel):
     def update_subplots(self, values):
         if self.init_flag:
             for channel in values.values():
-                self.canvas_list[channel.label].update_plot(channel)
+                if channel.n_samples:
+                    self.canvas_list[channel.label].update_plot(channel)
         else:
             self.__init_subplots(values)
             self.init_flag = True
@@ -182,31 +185,27 @@ class AdcPlotCanvas(wxplot.PlotCanvas):
             xmax = channel.data_t[-1]
             xmin = xmax - 15  # Time span is always 15 s
 
-        # Clip data
-        i_xmin = min(
-            range(len(channel.data_t)), key=lambda i: abs(channel.data_t[i] - xmin)
-        )  # Looking for the index of the value corresponding to t(xmin)
-        x = channel.data_t[i_xmin::].copy()
-        y = channel.data_y[i_xmin::].copy()
+        # Clip data (views of the channel buffers)
+        x, y = channel.window(xmax - xmin)
 
         # Minimum Y-axis value
-        if max(y) == 0:
+        y_max = y.max()
+        if y_max == 0:
             ymax = 0.15
-        elif max(y) > 0:
-            ymax = 1.15 * max(y)
+        elif y_max > 0:
+            ymax = 1.15 * y_max
         else:
-            ymax = 0.85 * max(y)
+            ymax = 0.85 * y_max
 
-        if min(y) == 0:
+        y_min = y.min()
+        if y_min == 0:
             ymin = -0.15
-        elif min(y) > 0:
-            ymin = 0.85 * min(y)
+        elif y_min > 0:
+            ymin = 0.85 * y_min
         else:
-            ymin = 1.15 * min(y)
+            ymin = 1.15 * y_min
 
-        x = channel.data_t
-        y = channel.data_y
-        data = list(zip(x, y))
+        data = np.column_stack((x, y))
         trace = wxplot.PolySpline(data, legend="CH" + str(channel.channel), colour="blue", width=1)
         graphics = wxplot.PlotGraphics([trace], xLabel="Time (s)", yLabel=channel.label)
         self.Draw(graphics, xAxis=(xmin, xmax), yAxis=(ymin, ymax))
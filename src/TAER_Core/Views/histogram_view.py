@@ -52,7 +52,8 @@ class HistogramView(AuxViewBase):
         max = self.panel_histogram_plot.txt_bin_max.GetValue()
         min = self.panel_histogram_plot.txt_bin_min.GetValue()
         step = self.panel_histogram_plot.txt_bin_step.GetValue()
-        return max, min, step
+        frames = self.panel_histogram_plot.txt_frames.GetValue()
+        return max, min, step, frames
 
 
 class HistogramPlotPanel(wx.Panel):
@@ -103,6 +104,13 @@ class HistogramPlotPanel(wx.Panel):
         local_sizer.Add(self.txt_bin_step, 1, wx.EXPAND)
         self.sizer_bins.Add(local_sizer, 0, wx.EXPAND | wx.BOTTOM | wx.LEFT | wx.RIGHT, 5)
 
+        local_sizer = wx.BoxSizer(wx.VERTICAL)
+        label = wx.StaticText(self, label="Frames", style=wx.LEFT)
+        local_sizer.Add(label, 0, wx.EXPAND | wx.BOTTOM, 1)
+        self.txt_frames = wxInt.IntCtrl(self, value=1, min=1, max=1000, limited=True)
+        local_sizer.Add(self.txt_frames, 1, wx.EXPAND)
+        self.sizer_bins.Add(local_sizer, 0, wx.EXPAND | wx.BOTTOM | wx.LEFT | wx.RIGHT, 5)
+
         self.sizer_buttons.Add(self.sizer_bins, 3, wx.EXPAND)
 
         self.SetSizerAndFit(self.sizer_main)
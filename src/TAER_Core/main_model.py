@@ -2,48 +2,86 @@
 
 import cv2 as cv
 import numpy as np
+import json
 import logging
+import queue
+import threading
+import time
+from collections import deque
 from TAER_Core.Libs.config import ModelConfig
-from TAER_Core.Libs import Device
+from TAER_Core.Libs import Device, DevicePool
+from TAER_Core.Libs.dev_opal_kelly import SerialTiming
+from TAER_Core.Libs.dev_simulated import SimFrontPanel
 
 
 class ItemBase:
+    __slots__ = ("label", "default_value", "value", "address", "hw_value", "hw_time")
+
     def __init__(self, label, address, defaultValue=0) -> None:
         self.label = label
         self.default_value = defaultValue
         self.value = defaultValue
         self.address = address
+        # Last value known to be in the hardware (None if unknown) and when it was known
+        self.hw_value = None
+        self.hw_time = 0.0
+
+    @property
+    def is_dirty(self) -> bool:
+        """True if the value hasn't been written to the hardware yet"""
+        return self.value != self.hw_value
+
+    def mark_synced(self, timestamp: float = None):
+        """Record the current value as the hardware value"""
+        self.hw_value = self.value
+        self.hw_time = time.perf_counter() if timestamp is None else timestamp
 
 
 class DeviceRegister(ItemBase):
+    __slots__ = ()
+
     def __init__(self, label, address, defaultValue=0) -> None:
         super().__init__(label, address, defaultValue)
 
 
 class DbBase:
+    """Database of items indexed by label and by address. When several items share an address, the address
+    index points to the first one added."""
+
     def __init__(self):
         super().__init__()
         self.d_item = {}
+        self.__address_index = {}
         self.logger = logging.getLogger(__name__)
 
     def add(self, item: ItemBase):
-        """Add an item to the database
+        """Add an item to the database. An item with the same label is replaced.
 
         Args:
             item (ItemBase): The item to add
         """
+        if item.label in self.d_item:
+            self.remove(item.label)
         self.d_item[item.label] = item
+        self.__address_index.setdefault(item.address, item)
 
-    def remove(self, item_label: str):
+    def remove(self, item_label: str) -> ItemBase:
         """Remove an item from the database
 
         Args:
             item_label (str): The label assigned to the item
+
+        Returns:
+            ItemBase: The item removed if any
         """
-        for _, item in self.d_item:
-            if item_label == item.label:
-                del self.d_item[item.label]
-                break
+        item = self.d_item.pop(item_label, None)
+        if item is not None and self.__address_index.get(item.address) is item:
+            del self.__address_index[item.address]
+            for other in self.d_item.values():
+                if other.address == item.address:
+                    self.__address_index[item.address] = other
+                    break
+        return item
 
     def get_item(self, item_label: str) -> ItemBase:
         """Get a item from the database
@@ -54,14 +92,18 @@ class DbBase:
         Returns:
             ItemBase: The item with the requested label if any
         """
-        for _, item in self.d_item.items():
-            if item.label == item_label:
-                return item
+        return self.d_item.get(item_label)
 
     def get_item_by_address(self, address: int) -> ItemBase:
-        for _, item in self.d_item.items():
-            if item.address == address:
-                return item
+        """Get a item from the database
+
+        Args:
+            address (int): The address of the item
+
+        Returns:
+            ItemBase: The first item added with the requested address if any
+        """
+        return self.__address_index.get(address)
 
     def set_item_value(self, item_label: str, value: int):
         """Set the value of an item
@@ -96,9 +138,42 @@ class DbBase:
         # Check if the item has an attribute called address
         if not hasattr(self.d_item[next(iter(self.d_item))], "address"):
             raise AttributeError
+        timestamp = time.perf_counter()
         for _, item in self.d_item.items():
             if item.address in item_values:
                 item.value = item_values[item.address]
+                item.mark_synced(timestamp)
+
+    def get_dirty_items(self) -> dict:
+        """Get the items whose value differs from the last known hardware value
+
+        Returns:
+            dict: A dictionary with item labels as keys and items as values
+        """
+        return {key: item for key, item in self.d_item.items() if item.is_dirty}
+
+    def mark_synced(self, items: dict = None):
+        """Record the current values as the hardware values
+
+        Args:
+            items (dict, optional): The items written or read. Defaults to None (all the items).
+        """
+        timestamp = time.perf_counter()
+        for item in (self.d_item if items is None else items).values():
+            item.mark_synced(timestamp)
+
+    def invalidate(self):
+        """Forget the hardware values, e.g. after the hardware is reset"""
+        for item in self.d_item.values():
+            item.hw_value = None
+
+    def is_fresh(self, max_age: float) -> bool:
+        """Check if all the hardware values are known and not older than max_age seconds"""
+        now = time.perf_counter()
+        for item in self.d_item.values():
+            if item.hw_value is None or now - item.hw_time > max_age:
+                return False
+        return True
 
     def get_item_value_list(self) -> dict:
         return {key: item.value for key, item in self.d_item.items()}
@@ -108,7 +183,14 @@ class DbBase:
 
 
 class ChipRegister(ItemBase):
+    """A chip register. Once it is added to a ChipRegisterDb its value lives in the ChipRegisterBank of the
+    database and the register is a view over it."""
+
+    __slots__ = ("signals", "size", "bank", "index", "__value")
+
     def __init__(self, label, address, defaultValue=0, signals=None) -> None:
+        self.bank = None
+        self.index = -1
         super().__init__(label, address, defaultValue)
         self.size = 8
         if signals is not None:
@@ -144,8 +226,23 @@ class ChipRegister(ItemBase):
         curr_value = (self.value & signal.mask) >> signal.bit
         return curr_value
 
+    @property
+    def value(self) -> int:
+        if self.bank is None:
+            return self.__value
+        return int(self.bank.data[self.index])
+
+    @value.setter
+    def value(self, value: int):
+        if self.bank is None:
+            self.__value = value
+        else:
+            self.bank.data[self.index] = value
+
 
 class ChipSignal:
+    __slots__ = ("label", "bit", "nbits", "mask")
+
     def __init__(self, label, bit, nbits=1):
         self.label = label
         self.bit = bit
@@ -153,28 +250,187 @@ class ChipSignal:
         self.mask = (pow(2, nbits) - 1) << bit
 
 
+class ChipRegisterBank:
+    """Register map of a chip stored in arrays: the register values in one NumPy array and the register index,
+    bit and mask of every signal in parallel arrays, so all the signals can be packed or unpacked at once."""
+
+    def __init__(self) -> None:
+        self.data = np.zeros(16, np.int64)
+        self.registers = []
+        self.signal_labels = []
+        self.__signal_reg = []
+        self.__signal_bit = []
+        self.__signal_mask = []
+        self.__signal_index = {}
+        self.__arrays = None
+
+    @property
+    def values(self) -> np.ndarray:
+        """The register values (a view, in the order the registers were attached)"""
+        return self.data[: len(self.registers)]
+
+    def attach(self, register: ChipRegister):
+        """Move the value of a register into the bank and make the register a view over it"""
+        value = register.value
+        index = len(self.registers)
+        if index == self.data.size:
+            self.data = np.concatenate((self.data, np.zeros(self.data.size, np.int64)))
+        self.data[index] = value
+        self.registers.append(register)
+        register.bank = self
+        register.index = index
+        for signal in getattr(register, "signals", {}).values():
+            self.__signal_index.setdefault(signal.label, []).append(len(self.signal_labels))
+            self.signal_labels.append(signal.label)
+            self.__signal_reg.append(index)
+            self.__signal_bit.append(signal.bit)
+            self.__signal_mask.append(signal.mask)
+        self.__arrays = None
+
+    def detach(self, register: ChipRegister):
+        """Give a register its value back and remove it from the bank"""
+        registers = [item for item in self.registers if item is not register]
+        for item in self.registers:
+            value = item.value
+            item.bank = None
+            item.index = -1
+            item.value = value
+        self.__init__()
+        for item in registers:
+            self.attach(item)
+
+    def __get_arrays(self):
+        if self.__arrays is None:
+            self.__arrays = (
+                np.array(self.__signal_reg, np.intp),
+                np.array(self.__signal_bit, np.int64),
+                np.array(self.__signal_mask, np.int64),
+            )
+        return self.__arrays
+
+    def unpack(self) -> np.ndarray:
+        """Get the values of all the signals, in the same order as signal_labels"""
+        reg, bit, mask = self.__get_arrays()
+        return (self.data[reg] & mask) >> bit
+
+    def pack(self, indices, signal_values, values: np.ndarray = None) -> np.ndarray:
+        """Set the values of several signals at once
+
+        Args:
+            indices (array_like): The signal indices (positions in "signal_labels")
+            signal_values (array_like): The signal values
+            values (np.ndarray, optional): Register values to pack into instead of the bank ones (e.g. a copy).
+
+        Returns:
+            np.ndarray: The indices of the registers modified
+        """
+        reg, bit, mask = self.__get_arrays()
+        indices = np.asarray(indices, np.intp)
+        reg = reg[indices]
+        mask = mask[indices]
+        nregisters = len(self.registers)
+        clear = np.zeros(nregisters, np.int64)
+        np.bitwise_or.at(clear, reg, mask)
+        new = np.zeros(nregisters, np.int64)
+        np.bitwise_or.at(new, reg, (np.asarray(signal_values, np.int64) << bit[indices]) & mask)
+        if values is None:
+            values = self.values
+        values &= ~clear
+        values |= new
+        return np.unique(reg)
+
+    def get_signal_indices(self, signal_label: str) -> list:
+        return self.__signal_index.get(signal_label, [])
+
+
 class ChipRegisterDb(DbBase):
+    """Database of chip registers which also indexes the registers by the labels of their signals. The register
+    values are stored in a ChipRegisterBank."""
+
     def __init__(self):
         super().__init__()
+        self.bank = ChipRegisterBank()
+        self.__signal_index = {}
+
+    def add(self, item: ChipRegister):
+        super().add(item)
+        self.bank.attach(item)
+        for signal_label in getattr(item, "signals", {}):
+            self.__signal_index.setdefault(signal_label, []).append(item)
+
+    def remove(self, item_label: str) -> ChipRegister:
+        item = super().remove(item_label)
+        if item is not None:
+            self.bank.detach(item)
+            for signal_label in getattr(item, "signals", {}):
+                registers = self.__signal_index[signal_label]
+                registers.remove(item)
+                if not registers:
+                    del self.__signal_index[signal_label]
+        return item
 
-    def set_signal(self, reg_label: str, signal_label: str):
+    def set_signal_values(self, signals: dict) -> dict:
+        """Set several signals at once. Labels of registers without signals set the whole register.
+
+        Args:
+            signals (dict): A dictionary containing the signal labels as keys and signal values as values
+
+        Returns:
+            dict: The registers modified, with their labels as keys
+        """
+        indices = []
+        values = []
+        modified = {}
+        for label, value in signals.items():
+            signal_indices = self.bank.get_signal_indices(label)
+            indices.extend(signal_indices)
+            values.extend([value] * len(signal_indices))
+            register = self.get_item(label)
+            if register is not None and not hasattr(register, "signals"):
+                register.value = value
+                modified[register.label] = register
+        if indices:
+            for index in self.bank.pack(indices, values):
+                register = self.bank.registers[index]
+                modified[register.label] = register
+        return modified
+
+    def get_signal_registers(self, signal_label: str) -> list:
+        """Get the registers which contain a signal
+
+        Args:
+            signal_label (str): The label assigned to the signal
+
+        Returns:
+            list: The registers containing the signal (empty if none)
+        """
+        return self.__signal_index.get(signal_label, [])
+
+    def set_signal(self, reg_label: str, signal_label: str, value: int):
         register = self.get_item(reg_label)
-        register.set_signal(signal_label)
+        register.set_signal(signal_label, value)
 
     def get_signal(self, reg_label: str, signal_label: str) -> ChipSignal:
         register = self.get_item(reg_label)
         return register.get_signal(signal_label)
 
     def get_signal_list(self) -> dict:
-        regs = self.get_item_list()
+        """Get the values of all the signals, and of the registers without signals, unpacked at once
+
+        Returns:
+            dict: A dictionary with signal (or register) labels as keys and their values as values
+        """
         signals = {}
-        for _, reg in regs.items():
-            tmp = {key: reg.get_signal(key) for key, item in reg.signals.items()}
-            signals.update(tmp)
+        for register in self.bank.registers:
+            if not hasattr(register, "signals"):
+                signals[register.label] = register.value
+        signals.update(zip(self.bank.signal_labels, self.bank.unpack().tolist()))
         return signals
 
 
 class Dac(ItemBase):
+    __slots__ = ("channel",)
+
     def __init__(self, label, address, channel, defaultValue=0) -> None:
         super().__init__(label, defaultValue)
         self.channel = channel
@@ -182,56 +438,984 @@ class Dac(ItemBase):
 
 
 class Adc(ItemBase):
-    def __init__(self, label, device_id, channel, offset, slope, defaultValue=0) -> None:
+    """ADC channel. The samples are kept in fixed-capacity float64 ring buffers (time, raw code and calibrated
+    value, value = raw * slope + offset), so the memory and the cost per sample stay constant however long the
+    channel is monitored. Every buffer is stored twice in a row, so the last samples are always contiguous and
+    data_t, data_y, data_raw and window() return views, not copies."""
+
+    HISTORY_SIZE = 32768  # Default capacity of the ring buffers (samples)
+    TIME_SPAN = 15  # Seconds kept when the old data is not kept
+
+    def __init__(
+        self, label, device_id, channel, offset, slope, defaultValue=0, tmeas=None, history_size=None
+    ) -> None:
         super().__init__(label, defaultValue)
         self.channel = channel
         self.device_id = device_id
         self.offset = offset
         self.slope = slope
-        self.data_t = []
-        self.data_y = []
+        self.tmeas = tmeas  # Sample period in seconds, None to use the global one
+        self.history_size = int(history_size) if history_size else self.HISTORY_SIZE
+        # Rows: time, raw code and value. Columns: the ring twice
+        self.__data = np.zeros((3, 2 * self.history_size), np.float64)
+        self.__head = 0  # Ring position of the next sample
+        self.__size = 0  # Samples kept
         self.IsEnabled = True
 
+    @property
+    def n_samples(self) -> int:
+        return self.__size
+
+    @property
+    def data_t(self) -> np.ndarray:
+        """Time of the samples kept, oldest first (view)"""
+        return self.__view(0)
+
+    @property
+    def data_raw(self) -> np.ndarray:
+        """Raw ADC codes of the samples kept, oldest first (view)"""
+        return self.__view(1)
+
+    @property
+    def data_y(self) -> np.ndarray:
+        """Calibrated values of the samples kept, oldest first (view)"""
+        return self.__view(2)
+
+    def __view(self, row: int) -> np.ndarray:
+        end = self.__head + self.history_size
+        return self.__data[row, end - self.__size : end]
+
+    def window(self, time_span: float) -> tuple:
+        """Get the samples of the last "time_span" seconds
+
+        Returns:
+            tuple: (t, y) views
+        """
+        t = self.data_t
+        if not len(t):
+            return t, self.data_y
+        start = np.searchsorted(t, t[-1] - time_span)
+        return t[start:], self.data_y[start:]
+
     def add_data(self, t_meas, adc_out, keep_old_data=False):
-        'Append one point to the (t,y) list. If "keep_old_data" is set to False, the first element of the list will be removed if t > 15 s.'
-        self.data_t.append(t_meas)
-        self.data_y.append(float(adc_out) * self.slope + self.offset)
-        if (not keep_old_data) & (self.data_t[-1] > 15):
-            self.__remove_data()
+        """Append one point to the (t,y) buffers. If "keep_old_data" is set to False, the oldest point is removed
+        if t > 15 s. Otherwise the oldest one is only removed when the buffers are full."""
+        head = self.__head
+        data = self.__data
+        value = float(adc_out) * self.slope + self.offset
+        data[0, head] = data[0, head + self.history_size] = t_meas
+        data[1, head] = data[1, head + self.history_size] = adc_out
+        data[2, head] = data[2, head + self.history_size] = value
+        self.__head = (head + 1) % self.history_size
+        if self.__size < self.history_size and (keep_old_data or t_meas <= self.TIME_SPAN or not self.__size):
+            self.__size = self.__size + 1
+
+    def add_samples(self, t_meas, adc_out):
+        """Append several points at once, the calibration is applied to all of them in one go
 
-    def __remove_data(self):
-        "Remove first element (oldest point)"
-        self.data_t.pop(0)
-        self.data_y.pop(0)
+        Args:
+            t_meas (array_like): Time of the samples
+            adc_out (array_like): Raw ADC codes
+        """
+        t_meas = np.asarray(t_meas, np.float64)[-self.history_size :]
+        adc_out = np.asarray(adc_out, np.float64)[-self.history_size :]
+        count = len(t_meas)
+        if not count:
+            return
+        positions = (self.__head + np.arange(count)) % self.history_size
+        for row, values in enumerate((t_meas, adc_out, adc_out * self.slope + self.offset)):
+            self.__data[row, positions] = values
+            self.__data[row, positions + self.history_size] = values
+        self.__head = (self.__head + count) % self.history_size
+        self.__size = min(self.__size + count, self.history_size)
+
+    def set_calibration(self, offset, slope):
+        """Change the calibration and recompute the values kept from their raw codes"""
+        self.offset = offset
+        self.slope = slope
+        np.multiply(self.__data[1], slope, out=self.__data[2])
+        self.__data[2] += offset
 
     def reset_data(self):
-        self.data_t = []
-        self.data_y = []
+        self.__head = 0
+        self.__size = 0
+
+
+class AdcScanner:
+    """Schedule the ADC channel reads. Only the enabled channels are sampled, each one with its own period, on a
+    drift-free clock: the deadlines are multiples of the period from the first sample and the missed ones are
+    skipped instead of accumulating delay."""
+
+    def __init__(self, adc_db: DbBase, default_period: float) -> None:
+        self.adc_db = adc_db
+        self.default_period = default_period
+        self.__next_time = {}
+        self.__stats = {}
+
+    def period(self, adc: Adc) -> float:
+        """Requested sample period of a channel in seconds"""
+        return adc.tmeas if adc.tmeas else self.default_period
+
+    def next_channel(self, now: float):
+        """Get the enabled channel with the earliest deadline
+
+        Args:
+            now (float): Current time (time.perf_counter)
+
+        Returns:
+            tuple: (Adc, deadline) or (None, None) if there isn't any enabled channel
+        """
+        next_adc = None
+        next_time = None
+        for adc in self.adc_db.get_item_list().values():
+            if not adc.IsEnabled:
+                continue
+            t = self.__next_time.setdefault(adc.label, now)
+            if next_time is None or t < next_time:
+                next_adc = adc
+                next_time = t
+        return next_adc, next_time
+
+    def done(self, adc: Adc, t_sample: float):
+        """Register a sample of a channel and schedule the next one
+
+        Args:
+            adc (Adc): The channel sampled
+            t_sample (float): Time of the sample (time.perf_counter)
+        """
+        period = self.period(adc)
+        count, t_first, _, missed = self.__stats.get(adc.label, (0, t_sample, t_sample, 0))
+        next_time = self.__next_time.get(adc.label, t_sample) + period
+        if next_time <= t_sample:
+            # Too late, skip the missed deadlines keeping the phase
+            skipped = int((t_sample - next_time) // period) + 1
+            next_time = next_time + skipped * period
+            missed = missed + skipped
+        self.__next_time[adc.label] = next_time
+        self.__stats[adc.label] = (count + 1, t_first, t_sample, missed)
+
+    def report(self) -> dict:
+        """Get the requested and achieved sample rate of every channel sampled
+
+        Returns:
+            dict: Channel labels as keys and (requested Hz, achieved Hz, missed deadlines) as values
+        """
+        report = {}
+        for label, (count, t_first, t_last, missed) in self.__stats.items():
+            adc = self.adc_db.get_item(label)
+            achieved = (count - 1) / (t_last - t_first) if t_last > t_first else 0.0
+            report[label] = (1 / self.period(adc), achieved, missed)
+        return report
+
+
+class DeviceState:
+    """Last state applied to the device through the model: the bitstream, the device registers, the DACs,
+    the mode and the chip registers. It is replayed on the device after a reconnection."""
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self):
+        self.bitstream = str()
+        self.mode = None
+        self.dev_reg = {}
+        self.dacs = {}
+        self.chip_reg = {}
+
+    def is_empty(self) -> bool:
+        return not (self.bitstream or self.dev_reg or self.dacs or self.chip_reg or self.mode is not None)
+
+
+class PresetPlan:
+    """A preset compiled into the writes that apply it: the mode name and the (label, value) pairs of the device
+    registers, DACs and chip registers (signals already packed into their registers), without duplicates and in
+    address order. The source preset is kept in "preset"."""
+
+    def __init__(self, name: str, preset: dict, mode, dev_reg: list, dacs: list, chip_reg: list) -> None:
+        self.name = name
+        self.preset = preset
+        self.mode = mode
+        self.dev_reg = dev_reg
+        self.dacs = dacs
+        self.chip_reg = chip_reg
+
+    def __len__(self) -> int:
+        return len(self.dev_reg) + len(self.dacs) + len(self.chip_reg) + (self.mode is not None)
+
+
+class PresetLibrary:
+    """Named presets, each one compiled once into a PresetPlan. The library is stored in a JSON file (no
+    pickle) with the source presets, so it stays valid if the register map of the chip changes."""
+
+    FORMAT = "taer-presets"
+    VERSION = 1
+
+    def __init__(self, compile_preset: object) -> None:
+        self.compile_preset = compile_preset
+        self.plans = {}
+
+    def add(self, name: str, preset: dict) -> PresetPlan:
+        """Compile a preset and add it, replacing any other with the same name"""
+        plan = self.compile_preset(preset, name)
+        self.plans[name] = plan
+        return plan
+
+    def get(self, name: str) -> PresetPlan:
+        return self.plans.get(name)
+
+    def remove(self, name: str) -> PresetPlan:
+        return self.plans.pop(name, None)
+
+    def names(self) -> list:
+        return list(self.plans)
+
+    def save(self, file_path: str, names: list = None):
+        """Save the presets (all of them by default) to a file"""
+        if names is None:
+            names = self.names()
+        content = {
+            "format": self.FORMAT,
+            "version": self.VERSION,
+            "presets": {name: self.plans[name].preset for name in names},
+        }
+        with open(file_path, "w") as fp:
+            json.dump(content, fp, separators=(",", ":"))
+
+    def load(self, file_path: str) -> list:
+        """Load and compile the presets of a file
+
+        Returns:
+            list: The names of the presets loaded
+
+        Raises:
+            ValueError: The file isn't a preset library
+        """
+        try:
+            with open(file_path, "r") as fp:
+                content = json.load(fp)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"{file_path} is not a preset library.") from e
+        if not isinstance(content, dict) or content.get("format") != self.FORMAT:
+            raise ValueError(f"{file_path} is not a preset library.")
+        for name, preset in content["presets"].items():
+            self.add(name, preset)
+        return list(content["presets"])
 
 
 class Histogram:
+    """Image histogram computed on a worker thread.
+
+    Integer frames (uint8/uint16) are counted with a single np.bincount over the full 16-bit code range and the
+    counts of the last "accumulate" frames are kept, so the user's bins (min, max, bins) are built from the
+    cumulative sum of those counts and can be changed without processing the frames again. Other data types
+    fall back to np.histogram over the bins, frame by frame. A frame submitted while the previous one is still
+    being processed is skipped.
+    """
+
+    CODES = 65536
+
     def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
         self.value = np.histogram(0, [1, 2])
         self.bins = 100
         self.max = 65535
         self.min = 100
+        self.accumulate = 1
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.on_histogram_ready_cb = None
+        self.thread = None
+        self.__cond = threading.Condition()
+        self.__lock = threading.Lock()
+        self.__stop = False
+        self.__busy = False
+        self.__frame = None
+        self.__total = np.zeros(self.CODES, np.int64)
+        self.__cumsum = np.zeros(self.CODES + 1, np.int64)
+        self.__history = np.zeros((self.accumulate, self.CODES), np.int64)
+        self.__history_index = 0
+        self.__bin_edges = None
+        self.__bin_codes = None
+        self.__has_counts = False
+
+    def set_settings(self, max, min, bins, accumulate=None):
+        """Change the bins and the number of frames accumulated. The counts kept are re-binned at once.
+
+        Args:
+            max (int): Upper edge of the last bin
+            min (int): Lower edge of the first bin
+            bins (int): Number of bin edges
+            accumulate (int, optional): Number of frames accumulated. Changing it clears the counts kept.
+        """
+        if max <= min:
+            raise ValueError(f"The histogram maximum ({max}) must be greater than the minimum ({min}).")
+        if bins < 2:
+            raise ValueError(f"The histogram needs 2 bin edges at least ({bins} given).")
+        with self.__lock:
+            self.bins = bins
+            self.max = max
+            self.min = min
+            self.__bin_edges = None
+            if accumulate is not None and accumulate != self.accumulate:
+                self.accumulate = int(accumulate) if int(accumulate) > 0 else 1
+                self.__history = np.zeros((self.accumulate, self.CODES), np.int64)
+                self.__clear()
+            if self.__has_counts:
+                self.value = self.__rebin()
+
+    def reset(self):
+        """Clear the accumulated counts"""
+        with self.__lock:
+            self.__clear()
+
+    def __clear(self):
+        # Called with the lock held
+        self.__history.fill(0)
+        self.__history_index = 0
+        self.__total.fill(0)
+        self.__has_counts = False
+
+    def register_on_histogram_ready_cb(self, callback: object):
+        """Register a callback called (from the worker thread) every time a new histogram is published"""
+        self.on_histogram_ready_cb = callback
+
+    def start(self):
+        """Start the worker thread. Until then the frames are processed by the thread submitting them."""
+        if self.thread is None:
+            self.__stop = False
+            self.thread = threading.Thread(target=self.__run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.__cond:
+            self.__stop = True
+            self.__cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, data: np.ndarray) -> bool:
+        """Queue a frame for the histogram
+
+        Args:
+            data (np.ndarray): The frame
+
+        Returns:
+            bool: False if the frame was skipped because the previous one is still being processed
+        """
+        data = np.asarray(data)
+        with self.__cond:
+            if self.__busy:
+                self.frames_skipped = self.frames_skipped + 1
+                return False
+            self.__busy = True
+        frame = self.__frame
+        if frame is None or frame.shape != data.shape or frame.dtype != data.dtype:
+            frame = np.empty_like(data)
+            self.__frame = frame
+        np.copyto(frame, data)
+        if self.thread is None:
+            self.__process()
+            return True
+        with self.__cond:
+            self.__cond.notify()
+        return True
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                while not self.__busy and not self.__stop:
+                    self.__cond.wait()
+                if self.__stop:
+                    break
+            self.__process()
+
+    def __process(self):
+        try:
+            data = self.__frame.ravel()
+            if data.dtype in (np.uint8, np.uint16):
+                counts = np.bincount(data, minlength=self.CODES)
+                with self.__lock:
+                    if self.accumulate > 1:
+                        history = self.__history[self.__history_index]
+                        self.__total -= history
+                        history[...] = counts
+                        self.__history_index = (self.__history_index + 1) % self.accumulate
+                        self.__total += counts
+                    else:
+                        self.__total[...] = counts
+                    self.__has_counts = True
+                    self.value = self.__rebin()
+            else:
+                with self.__lock:
+                    edges = np.linspace(self.min, self.max, self.bins)
+                self.value = np.histogram(data, edges)
+            self.frames_processed = self.frames_processed + 1
+        except Exception as e:
+            self.logger.error("Histogram failed: %s", e)
+            return
+        finally:
+            with self.__cond:
+                self.__busy = False
+        if self.on_histogram_ready_cb is not None:
+            self.on_histogram_ready_cb()
+
+    def __rebin(self) -> tuple:
+        # Same bins as np.histogram(data, np.linspace(min, max, bins)): for integer codes, the bin
+        # [e(i), e(i+1)) holds the codes from ceil(e(i)) to ceil(e(i+1)) - 1 and the last one is closed
+        if self.__bin_edges is None:
+            edges = np.linspace(self.min, self.max, self.bins)
+            codes = np.ceil(edges)
+            codes[-1] = np.floor(edges[-1]) + 1
+            self.__bin_edges = edges
+            self.__bin_codes = np.clip(codes, 0, self.CODES).astype(np.intp)
+        np.cumsum(self.__total, out=self.__cumsum[1:])
+        return np.diff(self.__cumsum[self.__bin_codes]), self.__bin_edges
+
+
+class PixelStatistics:
+    """Per-pixel running statistics of the captured frames (Welford's algorithm).
+
+    The count, mean, M2 (sum of squared deviations), minimum and maximum of every pixel are float64 arrays
+    updated in place, and the mean, standard deviation and SNR maps are computed on demand into preallocated
+    arrays, so a long noise run uses constant memory and doesn't allocate per frame. The arrays are allocated
+    with the shape given, or with the shape of the first frame added, and reallocated only if the first frame
+    after a reset has another shape. The capture loop feeds either the image shown ("image" source) or every
+    sub-sample of the frames read ("samples" source).
+    """
+
+    SOURCES = ("image", "samples")
+
+    def __init__(self, shape: tuple = None) -> None:
+        self.enabled = False
+        self.source = "image"
+        self.shape = None
+        self.count = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self.__mean = None
+        self.__frames = 0
+        self.__lock = threading.Lock()
+        if shape is not None:
+            self.__allocate(tuple(shape))
+
+    def enable(self, reset=True, source: str = None):
+        """Start accumulating the frames of the capture loop
+
+        Args:
+            reset (bool, optional): Clear the statistics first. Defaults to True.
+            source (str, optional): "image" or "samples". Defaults to None (unchanged).
+        """
+        if source is not None:
+            if source not in self.SOURCES:
+                raise ValueError(f"Invalid statistics source {source}. Valid values are: {', '.join(self.SOURCES)}.")
+            self.source = source
+        if reset:
+            self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Clear the statistics"""
+        with self.__lock:
+            self.__frames = 0
+            if self.shape is not None:
+                self.count.fill(0)
+                self.__mean.fill(0)
+                self.m2.fill(0)
+                self.min.fill(np.inf)
+                self.max.fill(-np.inf)
+
+    def __allocate(self, shape: tuple):
+        self.shape = shape
+        self.count = np.zeros(shape, np.float64)
+        self.__mean = np.zeros(shape, np.float64)
+        self.m2 = np.zeros(shape, np.float64)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self.__delta = np.empty(shape, np.float64)
+        self.__delta2 = np.empty(shape, np.float64)
+        self.__std = np.zeros(shape, np.float64)
+        self.__snr = np.zeros(shape, np.float64)
+
+    @property
+    def frames(self) -> int:
+        """Number of frames accumulated"""
+        return self.__frames
+
+    def add(self, frame: np.ndarray):
+        """Add a frame (or one sub-sample of every pixel) to the statistics"""
+        frame = np.asarray(frame)
+        with self.__lock:
+            if frame.shape != self.shape:
+                if self.__frames:
+                    raise ValueError(f"Frame shape {frame.shape} doesn't match the statistics shape {self.shape}.")
+                self.__allocate(frame.shape)
+            delta = self.__delta
+            delta2 = self.__delta2
+            self.count += 1
+            np.subtract(frame, self.__mean, out=delta)
+            np.divide(delta, self.count, out=delta2)
+            self.__mean += delta2
+            np.subtract(frame, self.__mean, out=delta2)
+            delta *= delta2
+            self.m2 += delta
+            np.minimum(self.min, frame, out=self.min)
+            np.maximum(self.max, frame, out=self.max)
+            self.__frames = self.__frames + 1
+
+    def add_frames(self, frames: np.ndarray):
+        """Add several frames (or sub-samples) stacked along the first axis"""
+        for frame in frames:
+            self.add(frame)
+
+    def mean(self) -> np.ndarray:
+        """Mean map, None before the first frame. The array is updated in place by the next frames, copy it to
+        keep it."""
+        with self.__lock:
+            return self.__mean
+
+    def std(self, ddof: int = 1) -> np.ndarray:
+        """Standard deviation map (0 where there are not enough samples) in a preallocated array, None before
+        the first frame"""
+        with self.__lock:
+            if self.shape is None:
+                return None
+            np.subtract(self.count, ddof, out=self.__delta)
+            self.__std.fill(0)
+            np.divide(self.m2, self.__delta, out=self.__std, where=self.__delta > 0)
+            np.sqrt(self.__std, out=self.__std)
+            return self.__std
+
+    def snr(self, ddof: int = 1) -> np.ndarray:
+        """Signal to noise ratio map, mean / std (0 where the std is 0) in a preallocated array, None before the
+        first frame"""
+        std = self.std(ddof)
+        if std is None:
+            return None
+        with self.__lock:
+            self.__snr.fill(0)
+            np.divide(self.__mean, std, out=self.__snr, where=std > 0)
+            return self.__snr
+
+
+class ContrastEngine:
+    """Contrast and colour mapping of uint16 frames through cached lookup tables.
+
+    The display window is fixed ("fixed": low/high), the frame range ("minmax") or a pair of percentiles of the
+    frame ("percentile"). The window is mapped to 0-255 with a "linear", "log" or "gamma" (x ** gamma) curve
+    into a 65536-entry table, rebuilt only when the window or the curve change, so mapping a frame is a single
+    table lookup. "colormap" selects an OpenCV false colour map (e.g. "JET" or cv.COLORMAP_JET), None for gray.
+    """
+
+    WINDOWS = ("fixed", "minmax", "percentile")
+    CURVES = ("linear", "log", "gamma")
+
+    def __init__(self) -> None:
+        self.window = "minmax"
+        self.low = 0
+        self.high = 65535
+        self.percentiles = (1.0, 99.0)
+        self.curve = "linear"
+        self.gamma = 1.0
+        self.colormap = None
+        self.colormap_lut = None
+        self.lut_builds = 0
+        self.__codes = np.arange(65536, dtype=np.float64)
+        self.__x = np.empty(65536, np.float64)
+        self.__lut = np.zeros(65536, np.uint8)
+        self.__lut_key = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Create the engine from the "contrast" section of the model configuration"""
+        engine = cls()
+        engine.configure(**vars(config))
+        return engine
+
+    def configure(self, window=None, low=None, high=None, percentiles=None, curve=None, gamma=None, colormap=""):
+        """Change the contrast settings, only the arguments given are changed
+
+        Args:
+            window (str, optional): "fixed", "minmax" or "percentile"
+            low (int, optional): Lower code of the fixed window
+            high (int, optional): Upper code of the fixed window
+            percentiles (tuple, optional): Lower and upper percentiles of the percentile window
+            curve (str, optional): "linear", "log" or "gamma"
+            gamma (float, optional): Exponent of the gamma curve
+            colormap (str or int, optional): OpenCV colour map name or code, None for gray
+        """
+        if window is not None:
+            if window not in self.WINDOWS:
+                raise ValueError(f"Invalid contrast window {window}. Valid values are: {', '.join(self.WINDOWS)}.")
+            self.window = window
+        if curve is not None:
+            if curve not in self.CURVES:
+                raise ValueError(f"Invalid contrast curve {curve}. Valid values are: {', '.join(self.CURVES)}.")
+            self.curve = curve
+        if low is not None:
+            self.low = int(low)
+        if high is not None:
+            self.high = int(high)
+        if percentiles is not None:
+            self.percentiles = (float(percentiles[0]), float(percentiles[1]))
+        if gamma is not None:
+            self.gamma = float(gamma)
+        if colormap != "":
+            self.colormap = colormap
+            self.colormap_lut = self.__build_colormap_lut(colormap)
+
+    @staticmethod
+    def __build_colormap_lut(colormap):
+        if colormap is None:
+            return None
+        if isinstance(colormap, str):
+            colormap = getattr(cv, "COLORMAP_" + colormap.upper())
+        ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+        return np.ascontiguousarray(cv.applyColorMap(ramp, colormap)[..., ::-1])
+
+    def get_window(self, raw: np.ndarray) -> tuple:
+        """Get the (low, high) codes of the display window for a frame"""
+        if self.window == "fixed":
+            return self.low, self.high
+        if self.window == "percentile":
+            cdf = np.cumsum(np.bincount(raw.ravel(), minlength=65536))
+            low = int(np.searchsorted(cdf, cdf[-1] * self.percentiles[0] / 100))
+            high = int(np.searchsorted(cdf, cdf[-1] * self.percentiles[1] / 100))
+            return low, high
+        return int(raw.min()), int(raw.max())
+
+    def get_lut(self, low: int, high: int) -> np.ndarray:
+        """Get the 65536-entry table of a window, rebuilt only if the window or the curve changed"""
+        key = (low, high, self.curve, self.gamma)
+        if key != self.__lut_key:
+            span = max(high - low, 1)
+            x = self.__x
+            np.subtract(self.__codes, low, out=x)
+            np.clip(x, 0, span, out=x)
+            if self.curve == "log":
+                np.log1p(x, out=x)
+                np.multiply(x, 1 / np.log1p(span), out=x)
+            else:
+                np.multiply(x, 1 / span, out=x)
+                if self.curve == "gamma":
+                    np.power(x, self.gamma, out=x)
+            np.multiply(x, 255, out=x)
+            np.copyto(self.__lut, x, casting="unsafe")
+            self.__lut_key = key
+            self.lut_builds = self.lut_builds + 1
+        return self.__lut
+
+    def map(self, raw: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Map a uint16 frame to uint8 with a single table lookup"""
+        low, high = self.get_window(raw)
+        return np.take(self.get_lut(low, high), raw, out=out)
+
+
+class DisplayPipeline:
+    """Conversion of the raw frames to the RGB uint8 image displayed.
+
+    The raw frame is copied once into a preallocated slot, scaled to uint8 and written already rotated and
+    flipped into one of three preallocated RGB buffers, so no array is allocated per frame. The rotate/flip
+    plan is worked out once. Once started, the conversion runs on a worker thread: only the last frame
+    submitted is converted (older pending ones are skipped) and the GUI just blits the last image published.
+    The buffer handed to the GUI isn't written again until a newer one is taken.
+    """
+
+    NBUFFERS = 3
+    # Rotation flag -> (np.rot90 turns, cv.rotate code)
+    ROTATIONS = {
+        "R0": (0, None),
+        "R90": (1, cv.ROTATE_90_COUNTERCLOCKWISE),
+        "R180": (2, cv.ROTATE_180),
+        "R270": (3, cv.ROTATE_90_CLOCKWISE),
+    }
+    # Mirror flag -> np.flip axis and cv.flip code
+    FLIPS = {"None": None, "MX": 0, "MY": 1}
+    # Data types supported by cv.convertScaleAbs
+    CV_DTYPES = (np.int8, np.uint16, np.int16, np.int32, np.float32, np.float64)
+
+    def __init__(self, shape: tuple, rotate: str = "R0", flip: str = "None") -> None:
+        if rotate not in self.ROTATIONS:
+            raise Exception("The rotate flag has invalid value. Valid values are: R0, R90, R180 or R270.")
+        if flip not in self.FLIPS:
+            raise Exception("The mirror flag has invalid value. Valid values are: MX or MY")
+        self.logger = logging.getLogger(__name__)
+        self.rotation, self.rotate_code = self.ROTATIONS[rotate]
+        self.flip_axis = self.FLIPS[flip]
+        self.__allocate(shape)
+        self.contrast = ContrastEngine()
+        self.__slots = [None] * self.NBUFFERS
+        self.__latest = 0
+        self.__pending = None
+        self.__converting = None
+        self.__front = 0
+        self.__displayed = 0
+        self.__cond = threading.Condition()
+        self.__stop = False
+        self.thread = None
+        self.on_image_ready_cb = None
+        self.frames_converted = 0
+        self.frames_skipped = 0
+
+    def __allocate(self, shape: tuple):
+        self.shape = tuple(shape)
+        out_shape = self.orient(np.empty(self.shape, np.uint8)).shape
+        self.__buffers = [np.zeros(out_shape + (3,), np.uint8) for _ in range(self.NBUFFERS)]
+        self.__gray = np.empty(self.shape, np.uint8)
+        self.__rotated = np.empty(np.rot90(self.__gray, self.rotation).shape, np.uint8)
+        self.__flipped = np.empty(out_shape, np.uint8)
+
+    def orient(self, data: np.ndarray) -> np.ndarray:
+        """Rotate and flip a frame (a view, no copy)"""
+        if self.rotation:
+            data = np.rot90(data, self.rotation)
+        if self.flip_axis is not None:
+            data = np.flip(data, self.flip_axis)
+        return data
+
+    def register_on_image_ready_cb(self, callback: object):
+        """Register a callback called (from the worker thread) every time a new image is published"""
+        self.on_image_ready_cb = callback
+
+    def start(self):
+        """Start the worker thread. Until then the frames are converted by the thread submitting them."""
+        if self.thread is None:
+            self.__stop = False
+            self.thread = threading.Thread(target=self.__run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.__cond:
+            self.__stop = True
+            self.__cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    @property
+    def image(self) -> np.ndarray:
+        """The last RGB image published"""
+        with self.__cond:
+            self.__displayed = self.__front
+            return self.__buffers[self.__front]
+
+    def submit(self, value: np.ndarray) -> np.ndarray:
+        """Copy a raw frame into a free slot and queue it for conversion
+
+        Args:
+            value (np.ndarray): The raw frame, flat or 2D (gray) or 3D (BGR)
 
-    def set_settings(self, max, min, bins):
-        self.bins = bins
-        self.max = max
-        self.min = min
+        Returns:
+            np.ndarray: The copy of the raw frame, kept until the slot is reused by a later frame
+        """
+        value = np.asarray(value)
+        with self.__cond:
+            busy = (self.__latest, self.__converting)
+            slot = next(idx for idx in range(self.NBUFFERS) if idx not in busy)
+        raw = self.__slots[slot]
+        if raw is None or raw.shape != value.shape or raw.dtype != value.dtype:
+            raw = np.empty_like(value)
+            self.__slots[slot] = raw
+        np.copyto(raw, value)
+        with self.__cond:
+            self.__latest = slot
+            if self.thread is not None:
+                if self.__pending is not None:
+                    self.frames_skipped = self.frames_skipped + 1
+                self.__pending = slot
+                self.__cond.notify()
+                return raw
+            self.__converting = slot
+        self.__process(slot)
+        return raw
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                while self.__pending is None and not self.__stop:
+                    self.__cond.wait()
+                if self.__stop:
+                    break
+                slot = self.__pending
+                self.__pending = None
+                self.__converting = slot
+            self.__process(slot)
+
+    def __process(self, slot: int):
+        raw = self.__slots[slot]
+        with self.__cond:
+            if raw.ndim > 1 and raw.shape[:2] != self.shape:
+                # Frames with another size (the buffers handed to the GUI are left untouched)
+                self.__allocate(raw.shape[:2])
+            index = next(idx for idx in range(self.NBUFFERS) if idx not in (self.__front, self.__displayed))
+        try:
+            self.__convert(raw, self.__buffers[index])
+        except Exception as e:
+            self.logger.error("Frame display conversion failed: %s", e)
+            with self.__cond:
+                self.__converting = None
+            return
+        with self.__cond:
+            self.__front = index
+            self.__converting = None
+            self.frames_converted = self.frames_converted + 1
+        if self.on_image_ready_cb is not None:
+            self.on_image_ready_cb()
+
+    def __convert(self, raw: np.ndarray, rgb: np.ndarray):
+        if raw.ndim == 1:
+            raw = raw[0 : self.shape[0] * self.shape[1]].reshape(self.shape)
+        if raw.ndim == 3:
+            # Colour frames are BGR, scaled between their minimum and maximum values if they aren't uint8
+            bgr = self.orient(raw)[..., ::-1]
+            if raw.dtype != np.uint8:
+                vmin = raw.min()
+                span = float(raw.max()) - float(vmin)
+                if span > 0:
+                    bgr = (bgr - vmin) / span * 255
+            np.copyto(rgb, bgr, casting="unsafe")
+            return
+        gray = self.to_uint8(raw)
+        if self.rotate_code is not None:
+            gray = cv.rotate(gray, self.rotate_code, dst=self.__rotated)
+        if self.flip_axis is not None:
+            gray = cv.flip(gray, self.flip_axis, dst=self.__flipped)
+        cv.cvtColor(gray, cv.COLOR_GRAY2RGB, dst=rgb)
+        colormap_lut = self.contrast.colormap_lut
+        if colormap_lut is not None:
+            cv.LUT(rgb, colormap_lut, dst=rgb)
+
+    def to_uint8(self, raw: np.ndarray) -> np.ndarray:
+        """Scale a 2D frame to uint8: uint16 frames go through the contrast engine, other types are scaled
+        between their minimum and maximum values"""
+        if raw.dtype == np.uint8:
+            return raw
+        if raw.dtype == np.uint16:
+            return self.contrast.map(raw, self.__gray)
+        gray = self.__gray
+        vmin = raw.min()
+        vmax = raw.max()
+        span = float(vmax) - float(vmin)
+        if span <= 0:
+            np.copyto(gray, raw, casting="unsafe")
+        elif raw.dtype in self.CV_DTYPES:
+            cv.convertScaleAbs(raw, gray, 255 / span, -float(vmin) * 255 / span)
+        else:
+            np.copyto(gray, (raw - vmin) / span * 255, casting="unsafe")
+        return gray
+
+
+class RawEventRing:
+    """Bounded ring of preallocated np.uint32 blocks shared between the thread draining the device pipe
+    (producer) and the processing of the raw events (consumer). No block is ever dropped: when every block is
+    pending, the producer waits for the consumer (the events stay in the device RAM meanwhile) and the wait is
+    counted in "full_waits". A producer failure is handed to the consumer with fail()."""
+
+    MIN_BLOCKS = 3  # One being written, one being read and one pending at least
+
+    def __init__(self, nblocks: int, nwords: int) -> None:
+        nblocks = max(nblocks, self.MIN_BLOCKS)
+        self.buffers = [np.empty(nwords, np.uint32) for _ in range(nblocks)]
+        self.lengths = [0] * nblocks
+        self.full_waits = 0
+        self.error = None
+        self.blocks_written = 0
+        self.blocks_read = 0
+        self.max_occupancy = 0
+        self.closed = False
+        self.__free = deque(range(nblocks))
+        self.__ready = deque()
+        self.__cond = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return len(self.buffers)
+
+    @property
+    def occupancy(self) -> int:
+        """Number of blocks written and not read yet"""
+        return len(self.__ready)
+
+    def acquire_write(self, timeout: float = None) -> int:
+        """Get the index of a block to be written by the producer, waiting for the consumer if the ring is full
+
+        Args:
+            timeout (float, optional): Maximum time to wait for a free block in seconds. Defaults to None (forever).
+
+        Returns:
+            int: The block index or None if there isn't any free block before the timeout or ring closing
+        """
+        with self.__cond:
+            if not self.__free and not self.closed:
+                self.full_waits = self.full_waits + 1
+                self.__cond.wait_for(lambda: self.__free or self.closed, timeout)
+            if self.closed or not self.__free:
+                return None
+            return self.__free.popleft()
+
+    def commit_write(self, index: int, nwords: int):
+        """Make a written block available to the consumer"""
+        with self.__cond:
+            self.lengths[index] = nwords
+            self.__ready.append(index)
+            self.blocks_written = self.blocks_written + 1
+            self.max_occupancy = max(self.max_occupancy, len(self.__ready))
+            self.__cond.notify()
+
+    def acquire_read(self, timeout: float = None) -> int:
+        """Get the index of the oldest written block
+
+        Args:
+            timeout (float, optional): Maximum time to wait for a block in seconds. Defaults to None (forever).
+
+        Returns:
+            int: The block index or None if there isn't any block available before the timeout or ring closing
+        """
+        with self.__cond:
+            self.__cond.wait_for(lambda: self.__ready or self.closed, timeout)
+            if not self.__ready:
+                return None
+            self.blocks_read = self.blocks_read + 1
+            return self.__ready.popleft()
+
+    def release_read(self, index: int):
+        """Give a block back to the producer once it is processed"""
+        with self.__cond:
+            self.__free.append(index)
+            self.__cond.notify_all()
+
+    def get_data(self, index: int) -> np.ndarray:
+        """Get the words written in a block. The view is valid until the block is released."""
+        return self.buffers[index][: self.lengths[index]]
+
+    def close(self):
+        """Wake up the consumer and the producer and stop accepting new blocks"""
+        with self.__cond:
+            self.closed = True
+            self.__cond.notify_all()
+
+    def fail(self, error: Exception):
+        """Close the ring because the producer failed. The error is kept for the consumer."""
+        self.error = error
+        self.close()
 
 
 class MainModel:
     """An object where the TAER data is stored."""
 
-    def __init__(self):
+    def __init__(self, device: Device = None):
         self.logger = logging.getLogger(__name__)
-        self.device = Device()
+        self.device = Device() if device is None else device
+        self.device_state = DeviceState()
 
     def config(self):
         """Configure the model"""
         self.config = ModelConfig()
+        self.__config_device()
         self.__config_default_values()
         self.__config_modes()
         self.__config_reg_device_db()
@@ -239,6 +1423,19 @@ class MainModel:
         self.__config_dac_db()
         self.__config_adc_db()
 
+    def __config_device(self):
+        """Select the device backend from the configuration file. A "simulator" section replaces the
+        Opal Kelly board with an in-process simulated front panel and a "serial" section sets the timing
+        model of the serial controller. An "io_trace" key with a number of records enables the I/O trace of the
+        device (see IoTrace)."""
+        if hasattr(self.config, "simulator") and self.device.manager is None:
+            self.logger.info("Using the simulated device backend.")
+            self.device.use_simulator(SimFrontPanel.from_config(self.config.simulator))
+        if hasattr(self.config, "serial"):
+            self.device.actions.serial_timing = SerialTiming.from_config(self.config.serial)
+        if hasattr(self.config, "io_trace"):
+            self.device.actions.enable_trace(int(self.config.io_trace))
+
     def __config_modes(self):
         """Configure the chip modes from the configuration file"""
         modes = self.config.modes
@@ -285,16 +1482,135 @@ class MainModel:
         if hasattr(self.config, 'adcs'):
             adcs = self.config.adcs
             for adc in adcs:
-                new_adc = Adc(adc[4], int(adc[0], 0), int(adc[1], 0), float(adc[2]), float(adc[3]))
+                # Optional sixth field: sample period of the channel in seconds
+                tmeas = float(adc[5]) if len(adc) > 5 else None
+                new_adc = Adc(
+                    adc[4],
+                    int(adc[0], 0),
+                    int(adc[1], 0),
+                    float(adc[2]),
+                    float(adc[3]),
+                    tmeas=tmeas,
+                    history_size=getattr(self.config, "adc_history_size", None),
+                )
                 self.adc_db.add(new_adc)
 
     def __config_default_values(self):
+        self.display = DisplayPipeline(
+            (self.config.img.w, self.config.img.h), self.config.img.rotate, self.config.img.flip
+        )
+        if hasattr(self.config, "contrast"):
+            self.display.contrast = ContrastEngine.from_config(self.config.contrast)
         self.main_img_data = np.zeros((self.config.img.w, self.config.img.h), np.uint16)
         self.img_histogram = Histogram()
+        self.pixel_stats = PixelStatistics((self.config.img.w, self.config.img.h))
+        self.presets = PresetLibrary(self.compile_preset)
         self.binary_file = str()
         self.on_model_update_cb = None
         self.FR_raw_mode_en = False
         self.TFS_raw_mode_en = False
+        self.read_signals_time = 0.0
+        if hasattr(self.config, "serial_fifo_depth"):
+            self.serial_fifo_depth = self.config.serial_fifo_depth
+        else:
+            self.serial_fifo_depth = 512
+        if hasattr(self.config, "raw_ring_blocks"):
+            self.raw_ring_blocks = self.config.raw_ring_blocks
+        else:
+            self.raw_ring_blocks = 8
+        if hasattr(self.config, "register_cache_max_age"):
+            self.register_cache_max_age = float(self.config.register_cache_max_age)
+        else:
+            self.register_cache_max_age = 0.0
+        if hasattr(self.config, "reconnect_resume_capture"):
+            self.reconnect_resume_capture = bool(self.config.reconnect_resume_capture)
+        else:
+            self.reconnect_resume_capture = False
+
+    def program(self, bitstream: str) -> bool:
+        """Program the device with a bitstream and remember it to restore the device after a reconnection
+
+        Args:
+            bitstream (str): The path where it is the bitstream
+
+        Returns:
+            bool: True if the device is configured successfully, False otherwise
+        """
+        self.binary_file = bitstream
+        is_programmed = self.device.program(bitstream)
+        # The FPGA registers and the mode come back to their defaults and the device is reset
+        for db in (self.dev_reg_db, self.dacs_db, self.chip_reg_db):
+            db.invalidate()
+        self.device_state.bitstream = bitstream
+        self.device_state.dev_reg = {}
+        self.device_state.mode = None
+        return is_programmed
+
+    def reset_device(self):
+        """Reset the device logic, its FIFO and its RAM. The hardware values known of the device registers, DACs
+        and chip registers are forgotten, so the next writes send all of them again."""
+        actions = self.device.actions
+        actions.reset_device()
+        actions.reset_fifo()
+        actions.reset_ram()
+        for db in (self.dev_reg_db, self.dacs_db, self.chip_reg_db):
+            db.invalidate()
+
+    def reset_chip(self):
+        """Reset the chip. The hardware values known of the chip registers are forgotten."""
+        self.device.actions.reset_chip()
+        self.chip_reg_db.invalidate()
+
+    def restore_state(self) -> bool:
+        """Replay the last state applied to the device, e.g. after a reconnection. The remembered bitstream is
+        programmed again only if the FPGA lost its configuration, then the device registers, DACs, mode and chip
+        registers are written as one batch.
+
+        Returns:
+            bool: True if the state is restored, False otherwise
+        """
+        state = self.device_state
+        if state.is_empty():
+            return False
+        t0 = time.perf_counter()
+        if not self.device.is_configured():
+            if not state.bitstream:
+                self.logger.warning("The device isn't configured and there isn't a bitstream to program it.")
+                return False
+            self.logger.info("Programming the device again with %s.", state.bitstream)
+            if not self.device.program(state.bitstream):
+                return False
+            self.binary_file = state.bitstream
+        registers = {}
+        for label, value in state.dev_reg.items():
+            self.dev_reg_db.set_item_value(label, value)
+            registers[label] = self.dev_reg_db.get_item(label)
+        dacs = {}
+        for label, value in state.dacs.items():
+            self.dacs_db.set_item_value(label, value)
+            dacs[label] = self.dacs_db.get_item(label)
+        frames = []
+        for label, value in state.chip_reg.items():
+            register = self.chip_reg_db.get_item(label)
+            register.value = value
+            frames.append(self.gen_serial_frame("write", register))
+        mode = None
+        if state.mode is not None:
+            self.current_mode = state.mode
+            mode = state.mode & 7
+        registers_ok, wires_ok, serial_ok = self.device.actions.write_state(registers, dacs, mode, frames)
+        for db in (self.dev_reg_db, self.dacs_db, self.chip_reg_db):
+            db.invalidate()
+        if registers_ok:
+            self.dev_reg_db.mark_synced(registers)
+        if wires_ok:
+            self.dacs_db.mark_synced(dacs)
+        if serial_ok:
+            for label in state.chip_reg:
+                self.chip_reg_db.get_item(label).mark_synced()
+        self.logger.info("Device state restored in %.1f ms.", (time.perf_counter() - t0) * 1000)
+        self.__on_model_update()
+        return True
 
     def write_dev_register(self, reg_label: str, value: int):
         """Write a device register (FPGA or microcontroller)
@@ -305,7 +1621,9 @@ class MainModel:
         """
         self.dev_reg_db.set_item_value(reg_label, value)
         register = self.dev_reg_db.get_item(reg_label)
-        self.device.actions.write_register(register.address, register.value)
+        if self.device.actions.write_register(register.address, register.value):
+            register.mark_synced()
+        self.device_state.dev_reg[register.label] = register.value
         self.__on_model_update()
 
     def read_dev_register(self, reg_label: str) -> int:
@@ -320,22 +1638,35 @@ class MainModel:
         register = self.dev_reg_db.get_item(reg_label)
         return self.device.actions.read_register(register.address)
 
-    def write_dev_registers(self, registers: dict):
-        """Write the registers in the device
+    def write_dev_registers(self, registers: dict, force: bool = False):
+        """Write the registers in the device. Only the registers whose value differs from the last known
+        hardware value are sent.
 
         Args:
             registers (dict): A dictionary containing the register labels as keys and register values as values
+            force (bool, optional): Write all the registers, whatever their hardware value. Defaults to False.
         """
         for label, value in registers.items():
             self.dev_reg_db.set_item_value(label, value)
-        self.device.actions.write_registers(self.dev_reg_db.get_item_list())
+        to_write = self.dev_reg_db.get_item_list() if force else self.dev_reg_db.get_dirty_items()
+        if to_write and self.device.actions.write_registers(to_write):
+            self.dev_reg_db.mark_synced(to_write)
+        self.device_state.dev_reg.update(self.dev_reg_db.get_item_value_list())
         self.__on_model_update()
 
-    def read_dev_registers(self):
-        """Read the device registers from the device and update the model"""
-        model_registers = self.dev_reg_db.get_item_list()
-        chip_registers = self.device.actions.read_registers(model_registers)
-        self.dev_reg_db.set_all_item_values_by_address(chip_registers)
+    def read_dev_registers(self, max_age: float = None):
+        """Read the device registers from the device and update the model. The read is skipped if all the values
+        are known and not older than max_age seconds.
+
+        Args:
+            max_age (float, optional): Staleness bound in seconds. Defaults to None ("register_cache_max_age").
+        """
+        if max_age is None:
+            max_age = self.register_cache_max_age
+        if max_age <= 0 or not self.dev_reg_db.is_fresh(max_age):
+            model_registers = self.dev_reg_db.get_item_list()
+            chip_registers = self.device.actions.read_registers(model_registers)
+            self.dev_reg_db.set_all_item_values_by_address(chip_registers)
         self.__on_model_update()
 
     def write_signal(self, signal_label: str, value: int):
@@ -345,14 +1676,13 @@ class MainModel:
             signal_label (str): The label assigned to the signal
             value (int): The signal value to write
         """
-        registers = self.chip_reg_db.get_item_list()
-        for _, register in registers.items():
-            for _, signal in register.signals.items():
-                if signal.label == signal_label:
-                    register.set_signal(signal_label, value)
-                    data = self.gen_serial_frame("write", register)
-                    self.logger.debug(f"SPI write -> bytes -> {data}")
-                    self.device.actions.write_serial(data)
+        for register in self.chip_reg_db.get_signal_registers(signal_label):
+            register.set_signal(signal_label, value)
+            data = self.gen_serial_frame("write", register)
+            self.logger.debug("SPI write -> bytes -> %s", data)
+            if self.device.actions.write_serial(data):
+                register.mark_synced()
+            self.device_state.chip_reg[register.label] = register.value
         self.__on_model_update()
 
     def read_signal(self, signal_label: str) -> int:
@@ -365,69 +1695,157 @@ class MainModel:
             int: The signal value requested
         """
         self.read_signals()
-        registers = self.chip_reg_db.get_item_list()
-        for _, register in registers.items():
-            for _, signal in register.signals.items():
-                if signal.label == signal_label:
-                    return register.get_signal(signal_label)
+        for register in self.chip_reg_db.get_signal_registers(signal_label):
+            return register.get_signal(signal_label)
 
-    def write_signals(self, signals: dict):
-        """Write several signals in the chip
+    def write_signals(self, signals: dict, force: bool = False):
+        """Write several signals in the chip. The changes are merged per register and every register whose value
+        differs from the last known hardware value is sent once, all of them in a single serial burst.
 
         Args:
             signals (dict): A dictionary containing the signal labels as keys and signal values as values
+            force (bool, optional): Write all the registers, whatever their hardware value. Defaults to False.
         """
-        for label, value in signals.items():
-            self.write_signal(label, value)
+        modified = self.chip_reg_db.set_signal_values(signals)
+        if force:
+            to_write = self.chip_reg_db.get_item_list()
+        else:
+            to_write = {label: register for label, register in modified.items() if register.is_dirty}
+        frames = [self.gen_serial_frame("write", register) for register in to_write.values()]
+        self.logger.debug("SPI burst write -> %d registers", len(frames))
+        if frames and self.device.actions.write_serial_burst(frames):
+            self.chip_reg_db.mark_synced(to_write)
+        for register in modified.values():
+            self.device_state.chip_reg[register.label] = register.value
         self.__on_model_update()
 
-    def read_signals(self):
-        """Read signals from the chip and updates the model"""
+    def read_signals(self, max_age: float = None):
+        """Read signals from the chip and updates the model. The read frames of all the registers are queued
+        back to back (in bursts that fit in the serial FIFO) and the answers are drained in one pass. The read
+        is skipped if all the values are known and not older than max_age seconds.
+
+        Args:
+            max_age (float, optional): Staleness bound in seconds. Defaults to None ("register_cache_max_age").
+        """
+        if max_age is None:
+            max_age = self.register_cache_max_age
+        if max_age > 0 and self.chip_reg_db.is_fresh(max_age):
+            self.__on_model_update()
+            return
+        t0 = time.perf_counter()
         registers = self.chip_reg_db.get_item_list()
+        burst = []
+        burst_size = 0
         for _, register in registers.items():
             data = self.gen_serial_frame("read", register)
-            self.logger.debug(f"SPI read -> bytes -> {data}")
-            self.device.actions.write_serial(data)
-            serial_data = self.device.actions.read_serial()
-            register.value = self.parse_serial_frame(serial_data, register)
+            if burst and burst_size + len(data) > self.serial_fifo_depth:
+                self.__read_signals_burst(burst, burst_size)
+                burst = []
+                burst_size = 0
+            burst.append((register, data))
+            burst_size = burst_size + len(data)
+        if burst:
+            self.__read_signals_burst(burst, burst_size)
+        self.read_signals_time = time.perf_counter() - t0
+        self.logger.info("%d chip registers read in %.1f ms.", len(registers), self.read_signals_time * 1000)
         self.__on_model_update()
 
-    def write_dacs(self, dacs: dict):
-        """Write the DACs
+    def __read_signals_burst(self, burst: list, nbytes: int):
+        with self.device.session() as actions:
+            actions.write_serial_burst([data for _, data in burst])
+            serial_data = actions.read_serial_burst(nbytes)
+        offset = 0
+        for register, data in burst:
+            register_data = serial_data[offset : offset + len(data)]
+            offset = offset + len(data)
+            if len(register_data) == len(data):
+                register.value = self.parse_serial_frame(register_data, register)
+                register.mark_synced()
+            else:
+                self.logger.warning("No answer for chip register %s.", register.label)
+
+    def write_dacs(self, dacs: dict, force: bool = False):
+        """Write the DACs. Only the DACs whose value differs from the last written one are sent.
 
         Args:
             dacs (dict): A dictionary containing the DAC labels as keys and DAC values as values
+            force (bool, optional): Write all the DACs, whatever their hardware value. Defaults to False.
         """
         for label, value in dacs.items():
             self.dacs_db.set_item_value(label, value)
-        self.device.actions.write_dacs(self.dacs_db.get_item_list())
+        to_write = self.dacs_db.get_item_list() if force else self.dacs_db.get_dirty_items()
+        if to_write and self.device.actions.write_dacs(to_write):
+            self.dacs_db.mark_synced(to_write)
+        self.device_state.dacs.update(self.dacs_db.get_item_value_list())
         self.__on_model_update()
 
+    def set_contrast(self, **settings):
+        """Change the display contrast (see ContrastEngine.configure) and show the current frame again"""
+        self.display.contrast.configure(**settings)
+        self.main_img_data = self.main_img_data
+
     def reset_image(self):
         """Set the image data array to zero (black)"""
         self.main_img_data = np.zeros((self.config.img.w, self.config.img.h), np.uint16)
 
-    def read_data(self, ndata: int):
-        raw_data = self.device.actions.read_ram(ndata)
-        raw_data = np.frombuffer(raw_data, np.uint32)
-        return raw_data
+    def read_data(self, ndata: int, out: np.ndarray = None) -> np.ndarray:
+        """Read a full frame from the device RAM
+
+        Args:
+            ndata (int): Number of bytes to read
+            out (np.ndarray, optional): Preallocated np.uint32 array to read into. Defaults to None.
+
+        Returns:
+            np.ndarray: The np.uint32 words read
+        """
+        return self.device.actions.read_ram(ndata, out)
+
+    def read_raw_data(self, ndata: int, out: np.ndarray = None) -> np.ndarray:
+        """Read a block of raw events from the device RAM
+
+        Args:
+            ndata (int): Number of bytes to read
+            out (np.ndarray, optional): Preallocated np.uint32 array to read into. Defaults to None.
 
-    def read_raw_data(self, ndata: int):
-        raw_data = self.device.actions.read_ram_raw(ndata)
-        raw_data = np.frombuffer(raw_data, np.uint32)
-        return raw_data
+        Returns:
+            np.ndarray: The np.uint32 words read
+        """
+        return self.device.actions.read_ram_raw(ndata, out)
 
-    def read_image(self, nsamples=1):
+    def read_image(self, nsamples=1, out: np.ndarray = None):
         """Read the image from the chip through the device
 
+        Args:
+            nsamples (int, optional): Number of samples per pixel. Defaults to 1.
+            out (np.ndarray, optional): Preallocated np.uint32 array to read into. Defaults to None.
+
         Returns:
-            numpy array: An array with a shape equal to the image resolution
+            numpy array: A flat np.uint32 array with nsamples words per pixel
         """
         # Each pixel is represented by 32-bit unsigned integer
         npix = self.config.img.w * self.config.img.h * 4 * nsamples
-        img_data = self.read_data(npix)
-        img = img_data.astype(np.uint32, casting="unsafe")
-        return img
+        return self.read_data(npix, out)
+
+    def split_samples(self, raw_data: np.ndarray, nsamples: int = 1) -> np.ndarray:
+        """Split the words read by read_image into one frame per sample. The words are pixel-major (the nsamples
+        words of a pixel are consecutive) and are used as the pixel values, as the image path does by default. A
+        chip initializer with its own encoding can replace this method with its own "split_samples".
+
+        Args:
+            raw_data (np.ndarray): The flat array read by read_image
+            nsamples (int, optional): Number of samples per pixel. Defaults to 1.
+
+        Returns:
+            numpy array: A (nsamples, w, h) view of raw_data
+
+        Example (a 2x2 image with 3 samples per pixel):
+            >>> raw_data = np.array([0, 1, 2, 10, 11, 12, 20, 21, 22, 30, 31, 32], np.uint32)
+            >>> model.split_samples(raw_data, 3)[1]
+            array([[ 1, 11],
+                   [21, 31]], dtype=uint32)
+        """
+        w, h = self.config.img.w, self.config.img.h
+        return np.moveaxis(raw_data[: w * h * nsamples].reshape(w, h, nsamples), -1, 0)
 
     def register_on_model_update_cb(self, callback: object):
         self.on_model_update_cb = callback
@@ -484,7 +1902,8 @@ class MainModel:
         if self.modes[mode] > 7:
             self.logger.warning("The mode ID is higher than the maximum allowed (3bits - 7)")
         self.current_mode = self.modes[mode]
-        self.device.actions.set_mode(self.current_mode & 7)
+        if self.device.actions.set_mode(self.current_mode & 7):
+            self.device_state.mode = self.current_mode
 
     def get_preset(self):
         params = {}
@@ -497,65 +1916,287 @@ class MainModel:
         params["dacs"] = self.dacs_db.get_item_value_list()
         return params
 
-    def set_preset(self, preset):
-        self.set_mode(preset["mode"])
-        self.write_dev_registers(preset["dev_reg"])
-        self.write_dacs(preset["dacs"])
-        self.write_signals(preset["chip_reg"])
-
-    def __rotate_and_flip(self, data):
-        rotate = self.config.img.rotate
-        flip = self.config.img.flip
-
-        if rotate == "R0":
-            pass
-        elif rotate == "R90":
-            data = np.rot90(data, 1)
-        elif rotate == "R180":
-            data = np.rot90(data, 2)
-        elif rotate == "R270":
-            data = np.rot90(data, 3)
-        else:
-            raise Exception("The rotate flag has invalid value. Valid values are: R0, R90, R180 or R270.")
+    def compile_preset(self, preset: dict, name: str = "") -> PresetPlan:
+        """Compile a preset (see get_preset) into the writes that apply it. Unknown labels are skipped.
 
-        if flip == "None":
-            pass
-        elif flip == "MX":
-            data = np.flipud(data)
-        elif flip == "MY":
-            data = np.fliplr(data)
-        else:
-            raise Exception("The mirror flag has invalid value. Valid values are: MX or MY")
+        Args:
+            preset (dict): The preset with "mode", "dev_reg", "dacs" and "chip_reg" keys
+            name (str, optional): The preset name
 
-        return data
+        Returns:
+            PresetPlan: The compiled preset
+        """
+        mode = preset.get("mode")
+        if mode is not None and mode not in self.modes:
+            raise ValueError(f"Preset {name}: unknown mode {mode}.")
+        dev_reg = {}
+        for label, value in preset.get("dev_reg", {}).items():
+            register = self.dev_reg_db.get_item(label)
+            if register is None:
+                self.logger.warning("Preset %s: unknown device register %s.", name, label)
+                continue
+            dev_reg[register.address] = (register.label, int(value))
+        dacs = {}
+        for label, value in preset.get("dacs", {}).items():
+            dac = self.dacs_db.get_item(label)
+            if dac is None:
+                self.logger.warning("Preset %s: unknown DAC %s.", name, label)
+                continue
+            dacs[(dac.address, dac.channel)] = (dac.label, int(value))
+        # Pack the signals into a copy of the register values
+        bank = self.chip_reg_db.bank
+        values = bank.values.copy()
+        indices = []
+        signal_values = []
+        touched = set()
+        for label, value in preset.get("chip_reg", {}).items():
+            signal_indices = bank.get_signal_indices(label)
+            if signal_indices:
+                indices.extend(signal_indices)
+                signal_values.extend([int(value)] * len(signal_indices))
+                continue
+            register = self.chip_reg_db.get_item(label)
+            if register is None or hasattr(register, "signals"):
+                self.logger.warning("Preset %s: unknown chip signal %s.", name, label)
+                continue
+            values[register.index] = int(value)
+            touched.add(register.index)
+        if indices:
+            touched.update(bank.pack(indices, signal_values, values).tolist())
+        chip_reg = sorted(
+            (bank.registers[index].address, bank.registers[index].label, int(values[index])) for index in touched
+        )
+        return PresetPlan(
+            name,
+            preset,
+            mode,
+            [dev_reg[address] for address in sorted(dev_reg)],
+            [dacs[address] for address in sorted(dacs)],
+            [(label, value) for _, label, value in chip_reg],
+        )
+
+    def set_preset(self, preset, force: bool = False):
+        """Apply a preset. Only the mode and the values which differ from the last known hardware state are sent,
+        all of them in a single device session.
+
+        Args:
+            preset (dict or PresetPlan): The preset (see get_preset) or a compiled one (see compile_preset)
+            force (bool, optional): Write all the values of the preset, whatever their hardware value. Defaults
+            to False.
+        """
+        plan = preset if isinstance(preset, PresetPlan) else self.compile_preset(preset)
+        t0 = time.perf_counter()
+        registers = {}
+        for label, value in plan.dev_reg:
+            register = self.dev_reg_db.get_item(label)
+            register.value = value
+            if force or register.is_dirty:
+                registers[label] = register
+        dacs = {}
+        for label, value in plan.dacs:
+            dac = self.dacs_db.get_item(label)
+            dac.value = value
+            if force or dac.is_dirty:
+                dacs[label] = dac
+        chip_registers = []
+        for label, value in plan.chip_reg:
+            register = self.chip_reg_db.get_item(label)
+            register.value = value
+            if force or register.is_dirty:
+                chip_registers.append(register)
+        mode = None
+        if plan.mode is not None:
+            self.current_mode = self.modes[plan.mode]
+            if force or self.current_mode != self.device_state.mode:
+                mode = self.current_mode & 7
+        frames = [self.gen_serial_frame("write", register) for register in chip_registers]
+        registers_ok = wires_ok = serial_ok = True
+        if registers or dacs or frames or mode is not None:
+            registers_ok, wires_ok, serial_ok = self.device.actions.write_state(registers, dacs, mode, frames)
+        if registers_ok:
+            self.dev_reg_db.mark_synced(registers)
+        if wires_ok:
+            self.dacs_db.mark_synced(dacs)
+        if serial_ok:
+            for register in chip_registers:
+                register.mark_synced()
+        state = self.device_state
+        state.dev_reg.update(plan.dev_reg)
+        state.dacs.update(plan.dacs)
+        state.chip_reg.update(plan.chip_reg)
+        if plan.mode is not None and wires_ok:
+            state.mode = self.current_mode
+        self.logger.debug(
+            "Preset %s applied: %d of %d writes sent in %.2f ms.",
+            plan.name,
+            len(registers) + len(dacs) + len(frames) + (mode is not None),
+            len(plan),
+            (time.perf_counter() - t0) * 1000,
+        )
+        self.__on_model_update()
 
     @property
     def main_img(self):
-        """Main image object"""
-        return self.__main_img
+        """Main image object (BGR uint8, rotated and flipped for display). It is a view of the RGB image of the
+        display pipeline (see DisplayPipeline.image), no copy is made."""
+        return self.display.image[..., ::-1]
 
     @property
     def main_img_data(self):
-        """Main image raw data"""
+        """Main image raw data. It is the copy of the frame kept in a display pipeline slot, which isn't written
+        while it is the current frame but is reused a few frames later: copy it to keep it longer."""
         return self.__main_img_data
 
     @main_img_data.setter
     def main_img_data(self, value):
-        self.__main_img_data = np.copy(value)
-        need_conversion = value.dtype != "uint8"
-        if need_conversion:
-            vmin = value.min()
-            vmax = value.max()
-            if vmax - vmin > 0:
-                value = (value - vmin) / (vmax - vmin) * 255
-            value = value.astype("uint8")
-
-        need_reshape = len(value.shape) == 1
-        if need_reshape:
-            value = np.reshape(value[0 : self.config.img.w * self.config.img.h], (self.config.img.w, self.config.img.h))
-        need_remapping = len(value.shape) == 2
-        if need_remapping:
-            value = cv.cvtColor(np.uint8(value), cv.COLOR_GRAY2BGR)
-
-        value = self.__rotate_and_flip(value)
-        self.__main_img = value
+        self.__main_img_data = self.display.submit(value)
+
+
+class BoardWorker:
+    """Capture thread of one board. The frames read are put in a bounded queue and the oldest one is dropped
+    when the consumer doesn't keep up, so a slow consumer never stalls the board. An exception raised by a capture
+    is logged and kept in "last_error", and the thread goes on with the next capture."""
+
+    ERROR_BACKOFF = 0.1  # Seconds waited after a failed capture
+
+    def __init__(self, model: MainModel, queue_size: int = 4) -> None:
+        self.model = model
+        self.frames = queue.Queue(queue_size)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.frame_count = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.last_error = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self, nsamples: int = 1):
+        """Start the capture thread
+
+        Args:
+            nsamples (int, optional): Number of samples per pixel. Defaults to 1.
+        """
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.__run, args=(nsamples,), daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop the capture thread and wait for it"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __run(self, nsamples: int):
+        while not self.stop_event.is_set():
+            try:
+                self.__capture(nsamples)
+            except Exception as e:
+                self.errors = self.errors + 1
+                self.last_error = e
+                self.logger.exception("Board %s: capture failed.", self.model.device.serial)
+                self.stop_event.wait(self.ERROR_BACKOFF)
+        self.logger.debug(
+            "Board %s: %d frames captured, %d dropped, %d errors.",
+            self.model.device.serial,
+            self.frame_count,
+            self.dropped,
+            self.errors,
+        )
+
+    def __capture(self, nsamples: int):
+        actions = self.model.device.actions
+        actions.start_capture()
+        try:
+            is_captured = actions.waiters["trigger"].wait(
+                actions.is_captured, self.model.config.operation_timeout, self.stop_event
+            )
+        finally:
+            actions.stop_capture()
+        if not is_captured:
+            if not self.stop_event.is_set():
+                self.timeouts = self.timeouts + 1
+                self.logger.error("Board %s: image readout timeout.", self.model.device.serial)
+            return
+        self.__put(self.model.read_image(nsamples))
+
+    def __put(self, frame: np.ndarray):
+        self.frame_count = self.frame_count + 1
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped = self.dropped + 1
+                except queue.Empty:
+                    pass
+
+
+class ModelPool:
+    """Several boards driven concurrently from one process. Every board connected gets its own MainModel, with
+    its register, DAC and chip register databases built from the same configuration file, and its own
+    BoardWorker. The "boards" key of the "simulator" section sets the number of simulated boards."""
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.pool = DevicePool()
+        self.models = {}
+        self.workers = {}
+        self.lock = threading.Lock()
+        self.pool.register_on_device_added_callback(self.__on_device_added)
+
+    def config(self):
+        """Configure the pool from the configuration file"""
+        self.config = ModelConfig()
+        if hasattr(self.config, "simulator"):
+            nboards = int(getattr(self.config.simulator, "boards", 1))
+            for idx in range(nboards):
+                front_panel = SimFrontPanel.from_config(self.config.simulator)
+                front_panel.serial = f"SIM{idx:06d}"
+                self.pool.add_simulator(front_panel)
+
+    def __on_device_added(self, device: Device):
+        model = MainModel(device)
+        model.config()
+        with self.lock:
+            self.models[device.serial] = model
+            self.workers[device.serial] = BoardWorker(model)
+        self.logger.info("Board %s added to the pool.", device.serial)
+
+    def start(self):
+        """Start monitoring the boards"""
+        self.pool.start()
+
+    def stop(self):
+        """Stop all the captures and the monitoring of the boards"""
+        self.stop_capture()
+        self.pool.stop()
+
+    def get_model(self, serial: str) -> MainModel:
+        return self.models.get(serial)
+
+    def get_frames(self, serial: str) -> queue.Queue:
+        return self.workers[serial].frames
+
+    def start_capture(self, nsamples: int = 1):
+        """Start the capture thread of every connected board
+
+        Args:
+            nsamples (int, optional): Number of samples per pixel. Defaults to 1.
+        """
+        with self.lock:
+            workers = list(self.workers.items())
+        for serial, worker in workers:
+            if self.models[serial].device.is_connected:
+                worker.start(nsamples)
+
+    def stop_capture(self):
+        """Stop the capture thread of every board"""
+        with self.lock:
+            workers = list(self.workers.values())
+        for worker in workers:
+            worker.stop()
@@ -5,14 +5,13 @@ import logging
 import logging.config
 import threading
 import time
-import numpy as np
 import wx
 import wx.lib.intctrl as wxInt
-from TAER_Core.main_model import MainModel
+from TAER_Core.main_model import MainModel, RawEventRing, AdcScanner
 from TAER_Core.main_view import MainView
 from TAER_Core.Views import SelectConfigDialog
 from TAER_Core.Controllers import *
-from TAER_Core.Libs import Config
+from TAER_Core.Libs import CompletionWaiter, Config
 import TAER_App
 from TAER_App.Tools import *
 from TAER_App.Tools.tool_base import ToolBase
@@ -27,6 +26,8 @@ class MainPresenter:
     inside your application.
     """
 
+    ADC_VIEW_PERIOD = 0.1  # Minimum time between ADC view refreshes in seconds
+
     def __init__(self, model: MainModel, view: MainView, interactor: MainInteractor):
         """
         Initialize the MainPresenter with the given model, view, and interactor.
@@ -98,12 +99,24 @@ class MainPresenter:
         self.one_shot_flag = False
         self.img_thread_handler = None
         self.adc_thread_handler = None
+        self.adc_stop_event = threading.Event()
+        self.adc_scanner = None
+        self.raw_ring = None
+        self.capture_stop_event = threading.Event()
+        self.blit_pending = False
+        self.histogram_pending = False
+        self.capture_waiter = CompletionWaiter()
+        self.waiter = CompletionWaiter()
 
     def __config_model(self):
         """
         Configure the model.
         """
         self.model.config()
+        self.model.display.register_on_image_ready_cb(self.__on_image_ready)
+        self.model.display.start()
+        self.model.img_histogram.register_on_histogram_ready_cb(self.__on_histogram_ready)
+        self.model.img_histogram.start()
 
     def __config_view(self):
         """
@@ -162,6 +175,8 @@ class MainPresenter:
                     self.model.gen_serial_frame = self.initializer.gen_serial_frame
                 if hasattr(self.initializer, "parse_serial_frame"):
                     self.model.parse_serial_frame = self.initializer.parse_serial_frame
+                if hasattr(self.initializer, "split_samples"):
+                    self.model.split_samples = self.initializer.split_samples
             else:
                 new_init = None
         if self.initializer is None:
@@ -209,6 +224,8 @@ class MainPresenter:
         self.model.device.stop()
         self.stop_main_img_thread()
         self.stop_adc()
+        self.model.display.stop()
+        self.model.img_histogram.stop()
         self.stop_flag = True
 
     def __show_select_config_dialog(self) -> str:
@@ -235,16 +252,47 @@ class MainPresenter:
 
     def update_image(self):
         """
-        Update the image on the GUI thread.
+        Update the image on the GUI thread. The frames set in the model are shown by the display
+        pipeline on their own, this is only needed to show the last image again.
+        """
+        self.__on_image_ready()
+
+    def __on_image_ready(self):
+        """
+        Blit the new image converted by the display pipeline. Only one blit is queued at a time.
+        """
+        if not self.blit_pending:
+            self.blit_pending = True
+            wx.CallAfter(self.__blit_image_on_gui_thread)
+
+    def __blit_image_on_gui_thread(self):
+        """
+        Show the last image published by the display pipeline.
+        """
+        self.blit_pending = False
+        self.view.image = self.model.display.image
+
+    def update_histogram(self):
+        """
+        Update the histogram view on the GUI thread.
         """
-        wx.CallAfter(self.__update_image_on_gui_thread)
+        wx.CallAfter(self.__update_histogram_on_gui_thread)
 
-    def __update_image_on_gui_thread(self):
+    def __on_histogram_ready(self):
         """
-        Update the image on the GUI thread.
+        Draw the new histogram. Only one draw is queued at a time and the frames captured meanwhile
+        are not submitted to the histogram (see process_img).
+        """
+        if not self.histogram_pending:
+            self.histogram_pending = True
+            self.update_histogram()
+
+    def __update_histogram_on_gui_thread(self):
+        """
+        Draw the last histogram on the histogram view.
         """
-        self.view.image = self.model.main_img
         self.view.image_histogram_frame.update_histogram(self.model.img_histogram)
+        self.histogram_pending = False
 
     def update_view(self, id=""):
         """
@@ -329,17 +377,18 @@ class MainPresenter:
 
         if id == self.view.edit_register_chip_frame.GetId():
             widgets = self.view.edit_register_chip_frame.panel_values.values_widgets
+            signal_dictionary = {}
             for label, widget in widgets.items():
                 if isinstance(widget, wxInt.IntCtrl):
-                    data = widget.GetValue()
-                    self.model.write_signal(label, data)
+                    signal_dictionary[label] = widget.GetValue()
                 elif isinstance(widget, wx.CheckBox):
                     data = widget.GetValue()
                     if data:
                         data = 1
                     else:
                         data = 0
-                    self.model.write_signal(label, data)
+                    signal_dictionary[label] = data
+            self.model.write_signals(signal_dictionary)
         self.logger.info("Updated.")
 
     def capture(self):
@@ -348,6 +397,7 @@ class MainPresenter:
         """
         if self.img_thread_handler is None:
             self.one_shot_flag = True
+            self.capture_stop_event.clear()
             self.img_thread_handler = threading.Thread(target=self.__img_thread)
             self.img_thread_handler.start()
 
@@ -365,6 +415,7 @@ class MainPresenter:
         Start the main image thread.
         """
         self.stop_cature_flag = False
+        self.capture_stop_event.clear()
         self.view.set_capture_mode(self.stop_cature_flag)
         self.img_thread_handler = threading.Thread(target=self.__img_thread)
         self.img_thread_handler.start()
@@ -374,6 +425,9 @@ class MainPresenter:
         Stop the main image thread.
         """
         self.stop_cature_flag = True
+        self.capture_stop_event.set()
+        if self.raw_ring is not None:
+            self.raw_ring.close()
         self.view.set_capture_mode(self.stop_cature_flag)
         if self.img_thread_handler is not None:
             if self.img_thread_handler.is_alive():
@@ -393,12 +447,18 @@ class MainPresenter:
             self.__standard_loop(flags)
 
         self.initializer.on_end_capture()
+        self.logger.debug(
+            "Completion waits: %d. Max. detection latency: %.3f ms.",
+            self.capture_waiter.wait_count,
+            self.capture_waiter.max_latency * 1e3,
+        )
         self.img_thread_handler = None
         self.logger.debug("Image thread finished")
 
     def __continuous_FR_raw_loop(self, flags):
         """
-        Continuous FR raw loop for capturing images.
+        Continuous FR raw loop for capturing images. A drain thread keeps reading the device
+        pipe into a ring of preallocated blocks while this loop processes them.
 
         Args:
             flags (bool): The flags to control the loop.
@@ -407,33 +467,46 @@ class MainPresenter:
         self.model.device.actions.events_done()
         self.model.device.actions.start_capture()
         n_events = (self.model.read_dev_register("N_EVENTS") // 4) * 32
+        ring = RawEventRing(self.model.raw_ring_blocks, n_events // 4)
+        self.raw_ring = ring
+        drain_thread_handler = threading.Thread(
+            target=self.__raw_drain_thread, args=(ring, n_events)
+        )
+        drain_thread_handler.start()
         while flags:
-            read_flag = self.wait_until(
-                self.model.device.actions.events_done,
-                self.model.config.operation_timeout,
-            )
-            if not read_flag:
-                self.logger.error("Image readout timeout.")
+            index = ring.acquire_read(self.model.config.operation_timeout)
+            if index is None:
+                if ring.error is not None:
+                    self.logger.error("Raw data readout failed, capture stopped: %s", ring.error)
+                    self.stop_cature_flag = True
+                    self.capture_stop_event.set()
+                    wx.CallAfter(self.view.set_capture_mode, self.stop_cature_flag)
+                    break
+                if not ring.closed:
+                    self.logger.error("Image readout timeout.")
             else:
                 t1 = time.time()
-                self.logger.info(f"Events: {self.model.device.actions.get_evt_count()}")
-                raw_data = self.model.read_raw_data(n_events)
-                self.initializer.on_after_capture(raw_data)
-                self.update_image()
-                # log data
-                if raw_data.size > 0:
-                    event_rate = 0.125 * n_events / (raw_data[-1] - raw_data[1])
-                    self.logger.info(
-                        "New data appended. Event rate :"
-                        + str(round(event_rate, 2))
-                        + "Meps/s."
-                    )
-                addr_rd, addr_wr = self.model.device.actions.check_addr_ram()
-                addr_diff = addr_wr - addr_rd
-                if addr_diff > 2 * n_events:
-                    self.logger.warning(
-                        "WARNING! Data is arriving faster that time required for writting."
-                    )
+                # The initializer gets a view of the ring block, which goes back to the drain thread once it
+                # returns (it must copy the data to keep it)
+                raw_data = ring.get_data(index)
+                try:
+                    self.initializer.on_after_capture(raw_data)
+                    # log data
+                    if raw_data.size > 0:
+                        event_rate = 0.125 * n_events / (raw_data[-1] - raw_data[1])
+                        self.logger.info(
+                            "New data appended. Event rate :"
+                            + str(round(event_rate, 2))
+                            + "Meps/s."
+                        )
+                finally:
+                    ring.release_read(index)
+                self.logger.info(
+                    "Ring occupancy: %d/%d blocks. Full ring waits: %d.",
+                    ring.occupancy,
+                    ring.size,
+                    ring.full_waits,
+                )
                 self.logger.info("Execution time: " + str(round(time.time() - t1, 3)))
             if self.stop_flag:
                 break
@@ -443,12 +516,54 @@ class MainPresenter:
             flags = (
                 not self.stop_cature_flag or self.one_shot_flag and not self.stop_flag
             )
-        self.logger.info("ENDS.")
+        ring.close()
+        drain_thread_handler.join()
+        self.raw_ring = None
+        self.logger.info(
+            "ENDS. Blocks read: %d/%d. Full ring waits: %d. Max. occupancy: %d.",
+            ring.blocks_read,
+            ring.blocks_written,
+            ring.full_waits,
+            ring.max_occupancy,
+        )
         self.model.device.actions.stop_capture()
         self.model.device.actions.reset_fifo()
         self.model.device.actions.reset_ram()
         self.model.device.actions.reset_aer()
 
+    def __raw_drain_thread(self, ring: RawEventRing, n_events: int):
+        """
+        Read the device pipe into the raw event ring as soon as the events are available.
+        An error closes the ring and is reported by the capture loop.
+
+        Args:
+            ring (RawEventRing): The ring where the blocks are written.
+            n_events (int): The number of bytes per block.
+        """
+        actions = self.model.device.actions
+        try:
+            while not ring.closed:
+                if not self.capture_waiter.wait(
+                    actions.events_done, 0.1, self.capture_stop_event
+                ):
+                    continue
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("Events: %d", actions.get_evt_count())
+                index = ring.acquire_write()
+                if index is None:
+                    break
+                raw_data = self.model.read_raw_data(n_events, ring.buffers[index])
+                ring.commit_write(index, raw_data.size)
+                addr_rd, addr_wr = actions.check_addr_ram()
+                addr_diff = addr_wr - addr_rd
+                if addr_diff > 2 * n_events:
+                    self.logger.warning(
+                        "WARNING! Data is arriving faster that time required for writting."
+                    )
+        except Exception as e:
+            ring.fail(e)
+        self.logger.debug("Drain thread finished")
+
     def __continuous_TFS_raw_loop(self, flags):
         """
         Continuous TFS raw loop for capturing images.
@@ -460,19 +575,19 @@ class MainPresenter:
         self.model.device.actions.events_done()
         while flags:
             self.model.device.actions.start_capture()
-            read_flag = self.wait_until(
+            read_flag = self.__wait_capture(
                 self.model.device.actions.is_captured,
                 self.model.config.operation_timeout,
             )
             if not read_flag:
-                self.logger.error("Image readout timeout.")
+                if not self.capture_stop_event.is_set():
+                    self.logger.error("Image readout timeout.")
             else:
                 t1 = time.time()
                 self.model.device.actions.stop_capture()
                 n_events = (self.model.device.actions.get_evt_count() // 4) * 32
                 raw_data = self.model.read_raw_data(n_events)
                 self.initializer.on_after_capture(raw_data)
-                self.update_image()
                 # log data
                 if raw_data.size > 0:
                     event_rate = 0.125 * n_events / (raw_data[-1] - raw_data[1])
@@ -515,21 +630,26 @@ class MainPresenter:
             t1 = time.time()
             self.initializer.on_before_capture()
             self.model.device.actions.start_capture()
-            read_flag = self.wait_until(
+            read_flag = self.__wait_capture(
                 self.model.device.actions.is_captured,
                 self.model.config.operation_timeout,
             )
             self.model.device.actions.stop_capture()
             if not read_flag:
-                self.logger.error("Image readout timeout.")
+                if not self.capture_stop_event.is_set():
+                    self.logger.error("Image readout timeout.")
             else:
                 raw_data = self.model.read_image(nsamples)
                 self.initializer.on_after_capture(raw_data)
                 try:
+                    self.__accumulate_pixel_stats(raw_data, nsamples)
                     self.process_img()
                 except Exception as e:
                     self.logger.error(e)
-                self.update_image()
+                self.logger.debug(
+                    "Capture detection latency: %.3f ms",
+                    self.capture_waiter.last_latency * 1e3,
+                )
             if self.stop_flag:
                 break
             elif self.one_shot_flag:
@@ -546,6 +666,7 @@ class MainPresenter:
         """
         if self.adc_thread_handler is None:
             self.flag_adc_run = True
+            self.adc_stop_event.clear()
             self.adc_thread_handler = threading.Thread(target=self.__adc_thread)
             self.adc_thread_handler.start()
         # reset ADC data
@@ -557,6 +678,7 @@ class MainPresenter:
         Stop the ADC thread.
         """
         self.flag_adc_run = False
+        self.adc_stop_event.set()
         if self.adc_thread_handler is not None:
             if self.adc_thread_handler.is_alive():
                 self.adc_thread_handler.join()
@@ -566,29 +688,59 @@ class MainPresenter:
         """
         Process the image.
         """
-        if self.view.image_histogram_frame.IsShown():
-            self.__process_img_histogram()
+        if self.view.image_histogram_frame.IsShown() and not self.histogram_pending:
+            self.model.img_histogram.submit(self.model.main_img_data)
 
-    def wait_until(self, somepredicate, timeout, period=0.25, *args, **kwargs):
+    def __wait_capture(self, predicate, timeout):
         """
-        Wait until a condition is met or timeout occurs.
+        Wait for a capture condition. The wait is cancelled when the capture is stopped.
+
+        Args:
+            predicate (callable): The condition to wait for.
+            timeout (float): The timeout period.
+
+        Returns:
+            bool: True if the condition is met, False on timeout or when the capture is stopped.
+        """
+        return self.capture_waiter.wait(predicate, timeout, self.capture_stop_event)
+
+    def __accumulate_pixel_stats(self, raw_data, nsamples):
+        """
+        Add the frame read to the per-pixel statistics, if they are enabled.
+
+        Args:
+            raw_data (np.ndarray): The words read, "nsamples" words per pixel (see MainModel.split_samples).
+            nsamples (int): The number of samples per pixel.
+        """
+        stats = self.model.pixel_stats
+        if not stats.enabled:
+            return
+        if stats.source == "samples":
+            stats.add_frames(self.model.split_samples(raw_data, nsamples))
+        else:
+            stats.add(self.model.main_img_data)
+
+    def wait_until(self, somepredicate, timeout, period=None, *args, **kwargs):
+        """
+        Wait until a condition is met or the timeout occurs.
+        The condition is checked with a short spin followed by an adaptive backoff
+        (see CompletionWaiter).
 
         Args:
             somepredicate (callable): The condition to wait for.
             timeout (float): The timeout period.
-            period (float): The period to check the condition.
+            period (float): The maximum period to check the condition. Defaults to the waiter's one.
             *args: Additional arguments.
             **kwargs: Additional keyword arguments.
 
         Returns:
             bool: True if the condition is met, False otherwise.
         """
-        mustend = time.time() + timeout
-        while time.time() < mustend:
-            if somepredicate(*args, **kwargs):
-                return True
-            time.sleep(period)
-        return False
+        return self.waiter.wait(
+            lambda: somepredicate(*args, **kwargs),
+            timeout,
+            period_max=period,
+        )
 
     def send_serial_data(self):
         """
@@ -599,10 +751,9 @@ class MainPresenter:
         )
         serial_data_tx = [int(num, 0) for num in raw_data.replace(" ", "").split(",")]
         self.logger.debug(f"Serial data sent: {serial_data_tx}")
-        self.model.device.actions.write_serial(serial_data_tx)  # Requesting RX data
-        serial_data_rx = (
-            self.model.device.actions.read_serial()
-        )  # Reading RX data from FPGA FIFO
+        with self.model.device.session() as actions:
+            actions.write_serial(serial_data_tx)  # Requesting RX data
+            serial_data_rx = actions.read_serial()  # Reading RX data from FPGA FIFO
         self.logger.debug(f"Serial data read: {serial_data_rx}")
         if serial_data_rx is not None:
             self.view.serial_control_frame.panel_serial_control.serial_rx_box.SetValue(
@@ -652,14 +803,15 @@ class MainPresenter:
                 save_path = fileDialog.GetPath()
                 if not save_path.endswith(".preset"):
                     save_path = save_path + ".preset"
-                with open(save_path, "wb") as fp:
-                    pickle.dump(to_save, fp, pickle.HIGHEST_PROTOCOL)
+                name = os.path.splitext(os.path.basename(save_path))[0]
+                self.model.presets.add(name, to_save)
+                self.model.presets.save(save_path, [name])
 
     def load_preset(self):
         """
         Load a preset.
         """
-        to_load = None
+        plan = None
         with wx.FileDialog(
             self.view,
             "Load preset",
@@ -668,39 +820,75 @@ class MainPresenter:
         ) as fileDialog:
             if fileDialog.ShowModal() != wx.ID_CANCEL:
                 load_path = fileDialog.GetPath()
-                with open(load_path, "rb") as fp:
-                    to_load = pickle.load(fp)
-        if to_load is not None:
-            self.model.set_preset(to_load)
-            self.view.set_mode(to_load["mode"])
+                plan = self.__load_preset_file(load_path)
+        if plan is not None:
+            self.model.set_preset(plan)
+            if plan.mode is not None:
+                self.view.set_mode(plan.mode)
+
+    def __load_preset_file(self, load_path):
+        """
+        Load the presets of a file into the model preset library and choose the one to apply.
+
+        Args:
+            load_path (str): The preset file path.
+
+        Returns:
+            PresetPlan: The preset chosen, None if cancelled.
+        """
+        try:
+            names = self.model.presets.load(load_path)
+        except ValueError:
+            # Presets saved by older versions are pickled dictionaries
+            self.logger.warning("Loading legacy (pickle) preset file %s.", load_path)
+            with open(load_path, "rb") as fp:
+                preset = pickle.load(fp)
+            names = [os.path.splitext(os.path.basename(load_path))[0]]
+            self.model.presets.add(names[0], preset)
+        if len(names) == 1:
+            return self.model.presets.get(names[0])
+        with wx.SingleChoiceDialog(self.view, "Choose the preset to apply", "Load preset", names) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return None
+            return self.model.presets.get(dialog.GetStringSelection())
 
     #
     # Processing routines
     #
-    def __process_img_histogram(self):
-        """
-        Process the image histogram.
-        """
-        data = self.model.main_img_data.flatten()
-        hist_settings = self.model.img_histogram
-        bins = np.linspace(hist_settings.min, hist_settings.max, hist_settings.bins)
-        hist = np.histogram(data, bins)
-        self.model.img_histogram.value = hist
-
     def __adc_thread(self):
         """
-        The ADC thread function.
+        The ADC thread function. Only the enabled channels are read, each one at its own
+        sample rate (see AdcScanner).
         """
-        t0 = time.time()
+        t0 = time.perf_counter()
+        t_view = t0
         id = self.view.adc_control_frame.GetId()
+        scanner = AdcScanner(self.model.adc_db, self.model.adc_tmeas)
+        self.adc_scanner = scanner
         while self.flag_adc_run:
-            for adc in self.model.adc_db.d_item.values():
-                t1 = time.time()
-                adc_data = self.model.device.actions.read_adc(
-                    adc.device_id, adc.channel
-                )
-                adc.add_data(t1 - t0, adc_data)
-            self.update_view(id)
-            if self.flag_adc_run:
-                time.sleep(self.model.adc_tmeas)
+            scanner.default_period = self.model.adc_tmeas
+            now = time.perf_counter()
+            adc, t_next = scanner.next_channel(now)
+            if adc is None:
+                # No channel enabled
+                self.adc_stop_event.wait(self.model.adc_tmeas)
+                continue
+            if t_next > now and self.adc_stop_event.wait(t_next - now):
+                break
+            t1 = time.perf_counter()
+            adc_data = self.model.device.actions.read_adc(adc.device_id, adc.channel)
+            adc.add_data(t1 - t0, adc_data)
+            scanner.done(adc, t1)
+            # Refresh the view at most every ADC_VIEW_PERIOD seconds
+            if t1 - t_view >= self.ADC_VIEW_PERIOD:
+                t_view = t1
+                self.update_view(id)
+        for label, (requested, achieved, missed) in scanner.report().items():
+            self.logger.info(
+                "ADC %s: %.2f Hz requested, %.2f Hz achieved, %d samples missed.",
+                label,
+                requested,
+                achieved,
+                missed,
+            )
         self.logger.debug("ADC thread finished")
@@ -6,7 +6,6 @@ import wx
 import threading
 import re
 import logging
-import cv2 as cv
 from TAER_Core.Views import (
     ValuesView,
     DeviceInfoView,
@@ -180,8 +179,8 @@ class MainView(wx.Frame):
     def image(self, value):
         with self.imgLock:
             h, w = value.shape[:2]  # The array shape is H, W
-            valueRGB = cv.cvtColor(value, cv.COLOR_BGR2RGB)
-            self.panel_image.img_ctrl.img = wx.ImageFromBuffer(w, h, valueRGB)
+            # The value is already an RGB uint8 buffer owned by the model display pipeline
+            self.panel_image.img_ctrl.img = wx.ImageFromBuffer(w, h, value)
         self.panel_image.img_ctrl.update()
 
 